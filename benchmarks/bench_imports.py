@@ -0,0 +1,73 @@
+# benchmarks/bench_imports.py
+"""
+Guards query-path startup latency.
+
+Each entry point is imported in a fresh interpreter (best of --repeat runs)
+and must stay within its millisecond budget without loading any of the
+heavy modules it is not supposed to need.  Exits with code 1 when a budget
+or a forbidden import is violated, so it can gate CI next to
+bench_pipeline.py.
+
+    python benchmarks/bench_imports.py
+    python benchmarks/bench_imports.py --scale 2.0   # slower machines
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# module -> (budget in ms, modules it must not import)
+IMPORT_BUDGETS = {
+    "src.index.feature_index": (400, ["pandas", "sklearn", "spotipy"]),
+    "src.agents": (100, ["pandas", "sklearn", "spotipy"]),
+    "src.utils.cache": (400, ["pandas", "sklearn", "spotipy"]),
+    "src.agents.recommendation_agent": (1500, ["sklearn", "spotipy"]),
+    "src.agents.data_acquisition_agent": (1500, ["sklearn", "spotipy"]),
+}
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "loaded": sorted(m for m in {forbidden!r} if m in sys.modules)}}))
+"""
+
+
+def measure(module: str, forbidden: list, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, forbidden=forbidden)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {"ms": min(r["ms"] for r in runs), "loaded": runs[0]["loaded"]}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per module (best is kept)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget, for slower machines")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for module, (budget_ms, forbidden) in IMPORT_BUDGETS.items():
+        result = measure(module, forbidden, args.repeat)
+        budget_ms *= args.scale
+        status = "ok"
+        if result["loaded"]:
+            status = f"FAIL imports {', '.join(result['loaded'])}"
+        elif result["ms"] > budget_ms:
+            status = "FAIL over budget"
+        failures += status != "ok"
+        print(f"{module:<36} {result['ms']:8.1f} ms (budget {budget_ms:6.0f}) {status}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
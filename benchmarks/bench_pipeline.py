@@ -0,0 +1,211 @@
+# benchmarks/bench_pipeline.py
+"""
+Benchmarks the acquisition -> features -> recommendation pipeline on
+synthetic catalogs.
+
+Each stage (streamed index build, load, feature mapping, scaling, scoring, top-k) is timed
+separately and the process high-water RSS recorded after it; with
+--trace-memory each stage's peak traced allocation is recorded too
+(tracemalloc slows Python-heavy stages, so keep it off for timing gates).  Results are written as
+JSON so runs can be compared; pass --baseline to fail (exit code 1) when a
+stage regresses by more than --max-regression.  --workers N also times
+the same queries through a ShardedSearcher with N processes.
+
+    python benchmarks/bench_pipeline.py --sizes 10000,100000 --output bench.json
+    python benchmarks/bench_pipeline.py --baseline bench.json --output new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path to allow absolute imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.data_acquisition_agent import DataAcquisitionAgent
+from src.agents.feature_engineering_agent import FeatureEngineeringAgent
+from src.index.feature_index import FeatureIndex, NUMERICAL_FEATURES, top_k
+from src.index.sharded import ShardedSearcher
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 5_000_000]
+GENRES = ["pop", "rock", "hip hop", "jazz", "classical", "electronic", "country", "latin"]
+
+
+def make_catalog(n_tracks: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic catalog in the DataAcquisitionAgent schema with the 9 audio features."""
+    rng = np.random.default_rng(seed)
+    catalog = pd.DataFrame({
+        "song_id": [f"trk{i:08d}" for i in range(n_tracks)],
+        "title": [f"Track {i}" for i in range(n_tracks)],
+        "artist": [f"Artist {i}" for i in rng.integers(0, max(1, n_tracks // 10), n_tracks)],
+        "genre": rng.choice(GENRES, n_tracks),
+        "year": rng.integers(1921, 2021, n_tracks),
+        "popularity": rng.integers(0, 101, n_tracks),
+        "explicit": rng.random(n_tracks) < 0.1,
+    })
+    catalog["tempo"] = rng.normal(120, 30, n_tracks).clip(40, 220)
+    catalog["loudness"] = rng.normal(-9, 4, n_tracks).clip(-60, 0)
+    for feature in NUMERICAL_FEATURES:
+        if feature not in catalog.columns:
+            catalog[feature] = rng.random(n_tracks)
+    return catalog
+
+
+def _max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Stage:
+    """
+    Times a block and records memory after it.  When tracemalloc is on, the
+    block's peak traced allocation is recorded as well; it sees NumPy
+    buffers but not every C-level allocation (e.g. the CSV parser).
+    """
+
+    def __init__(self, results: list, n_tracks: int, name: str, items: int):
+        self.results, self.n_tracks, self.name, self.items = results, n_tracks, name, items
+
+    def __enter__(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20 if tracemalloc.is_tracing() else None
+        self.results.append({
+            "n_tracks": self.n_tracks,
+            "stage": self.name,
+            "seconds": seconds,
+            "peak_mb": peak_mb,
+            "max_rss_mb": _max_rss_mb(),
+            "items_per_second": self.items / seconds if seconds > 0 else None,
+        })
+        memory = f"{peak_mb:10.1f} MB peak" if peak_mb is not None else f"{_max_rss_mb():10.1f} MB rss"
+        print(f"{self.n_tracks:>9,} {self.name:<16} {seconds * 1000:10.1f} ms {memory}", flush=True)
+
+
+def bench_size(n_tracks: int, n_queries: int, k: int, data_dir: str, trace_memory: bool = False, workers: int = 0) -> list:
+    results = []
+    csv_path = os.path.join(data_dir, f"synthetic_{n_tracks}.csv")
+    if not os.path.exists(csv_path):
+        make_catalog(n_tracks).to_csv(csv_path, index=False)
+
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        agent = DataAcquisitionAgent(csv_path)
+        # First, so its max RSS is not masked by the whole-catalog stages below
+        with Stage(results, n_tracks, "stream_build", n_tracks):
+            FeatureIndex.from_compact_chunks(lambda: FeatureEngineeringAgent().iter_compact_features(agent.iter_chunks()))
+
+        with Stage(results, n_tracks, "load", n_tracks):
+            raw = pd.read_csv(csv_path)
+        del raw
+        with Stage(results, n_tracks, "load+validate", n_tracks):
+            agent.load_data()
+
+        with Stage(results, n_tracks, "feature_mapping", n_tracks):
+            features = FeatureEngineeringAgent().get_features(agent.song_data)
+
+        with Stage(results, n_tracks, "feature_compact", n_tracks):
+            compact = FeatureEngineeringAgent().get_compact_features(agent.song_data)
+        del compact
+
+        with Stage(results, n_tracks, "scaling", n_tracks):
+            index = FeatureIndex.build(features)
+
+        seeds = np.random.default_rng(1).choice(n_tracks, min(n_queries, n_tracks), replace=False)
+        with Stage(results, n_tracks, "scoring", len(seeds)):
+            scores = index.matrix[seeds] @ index.matrix.T
+
+        with Stage(results, n_tracks, "top_k", len(seeds)):
+            top_k(scores, k)
+        del scores
+
+        if workers:
+            with ShardedSearcher(index, workers) as sharded:
+                sharded.search(index.matrix[seeds[:1]], k)  # start the workers outside the timing
+                with Stage(results, n_tracks, f"sharded_x{workers}", len(seeds)):
+                    sharded.search(index.matrix[seeds], k)
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def compare(results: list, baseline_path: str, max_regression: float) -> list:
+    """Returns the (size, stage, old, new) entries slower than the baseline allows."""
+    with open(baseline_path) as f:
+        baseline = {(r["n_tracks"], r["stage"]): r["seconds"] for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        old = baseline.get((r["n_tracks"], r["stage"]))
+        if old is not None and r["seconds"] > old * (1 + max_regression):
+            regressions.append((r["n_tracks"], r["stage"], old, r["seconds"]))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated catalog sizes")
+    parser.add_argument("--queries", type=int, default=256, help="seeds scored per size")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--data-dir", default=None, help="where synthetic CSVs are cached (default: temp dir)")
+    parser.add_argument("--trace-memory", action="store_true", help="record per-stage tracemalloc peaks")
+    parser.add_argument("--workers", type=int, default=0, help="also time ShardedSearcher with this many processes")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="previous results file to gate against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed slowdown per stage vs baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or tmp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        results = []
+        for n_tracks in sizes:
+            results.extend(bench_size(n_tracks, args.queries, args.k, data_dir, args.trace_memory, args.workers))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "max_rss_mb": _max_rss_mb(),
+            "trace_memory": args.trace_memory,
+            "queries": args.queries,
+            "k": args.k,
+            "workers": args.workers,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_regression)
+        for n_tracks, stage, old, new in regressions:
+            print(f"REGRESSION {n_tracks:,} {stage}: {old * 1000:.1f} ms -> {new * 1000:.1f} ms")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
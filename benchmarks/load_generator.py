@@ -0,0 +1,120 @@
+# benchmarks/load_generator.py
+"""
+Closed-loop load generator for src/service/recommendation_service.py.
+
+Opens --concurrency keep-alive connections, each sending POST /recommend
+for random catalog seeds back to back, and reports throughput, latency
+percentiles (p50/p90/p99/max) and responses by status code.  Seeds are
+sampled from the same index file the service was started with.
+
+    python -m src.service.recommendation_service --index data/feature_index.npz &
+    python benchmarks/load_generator.py --index data/feature_index.npz --concurrency 64 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+# Add project root to path to allow absolute imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.index.feature_index import FeatureIndex
+
+
+async def _request(reader, writer, host: str, body: bytes) -> int:
+    writer.write(
+        f"POST /recommend HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _client(host: str, port: int, bodies: list, deadline: float, latencies: list, statuses: Counter, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            body = bodies[rng.integers(len(bodies))]
+            start = time.perf_counter()
+            status = await _request(reader, writer, host, body)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+    finally:
+        writer.close()
+
+
+async def run_load(host: str, port: int, seed_ids, concurrency: int, duration: float, k: int, seed: int = 0) -> dict:
+    bodies = [json.dumps({"song_id": s, "k": k}, default=lambda v: v.item()).encode("utf-8") for s in seed_ids]
+    latencies, statuses = [], Counter()
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        _client(host, port, bodies, deadline, latencies, statuses, np.random.default_rng(seed + i))
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    ms = np.sort(np.asarray(latencies)) * 1000 if latencies else np.zeros(1)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "ok_rps": statuses[200] / elapsed,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms[-1]),
+        "statuses": {str(code): n for code, n in sorted(statuses.items())},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", required=True, help="index file the service was started with (seed ids are sampled from it)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--concurrency", default="64", help="comma-separated connection counts, one run each")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seeds", type=int, default=10000, help="distinct seed songs to draw from")
+    parser.add_argument("--output", default=None, help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    index = FeatureIndex.load(args.index)
+    rng = np.random.default_rng(0)
+    seed_ids = index.ids(rng.choice(len(index), min(args.seeds, len(index)), replace=False))
+
+    results = []
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        result = asyncio.run(run_load(args.host, args.port, seed_ids, concurrency, args.duration, args.k))
+        results.append(result)
+        print(
+            f"c={concurrency:<4} {result['throughput_rps']:9.1f} req/s  p50 {result['p50_ms']:7.2f} ms  "
+            f"p99 {result['p99_ms']:7.2f} ms  max {result['max_ms']:7.2f} ms  statuses {result['statuses']}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(set(r["statuses"]) <= {"200"} for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
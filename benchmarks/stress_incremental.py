@@ -0,0 +1,82 @@
+# benchmarks/stress_incremental.py
+"""
+Regression check for queries racing background compaction.
+
+Builds an incremental index with a tiny compact_ratio so that nearly every
+add_songs/delete_songs call starts a compaction, then runs
+recommend_by_id and recommend_batch from other threads for --seconds.
+Fails (exit code 1) on any exception or if a seed is recommended to
+itself, the symptoms of rows renumbered mid-query.
+
+    python benchmarks/stress_incremental.py --tracks 5000 --seconds 5
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Add project root to path to allow absolute imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_pipeline import make_catalog
+from src.agents.recommendation_agent import RecommendationAgent
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=5000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    catalog = make_catalog(args.tracks)
+    base = catalog.iloc[:args.tracks // 2]
+    agent = RecommendationAgent()
+    agent.build_index(base, incremental=True)
+    agent.index.compact_ratio = 0.01
+
+    stable_ids = base["song_id"].to_numpy()[:200]  # never deleted, always valid seeds
+    failures = []
+    deadline = time.perf_counter() + args.seconds
+
+    def writer():
+        rng = np.random.default_rng(1)
+        extra = catalog.iloc[args.tracks // 2:]
+        while time.perf_counter() < deadline:
+            batch = extra.iloc[rng.choice(len(extra), 20, replace=False)]
+            agent.add_songs(batch)
+            agent.delete_songs(batch["song_id"].iloc[:10])
+
+    def reader(seed):
+        rng = np.random.default_rng(seed)
+        while time.perf_counter() < deadline:
+            try:
+                song_id = stable_ids[rng.integers(len(stable_ids))]
+                recs = agent.recommend_by_id(song_id, 10)
+                if song_id in set(recs["song_id"]):
+                    failures.append(f"recommend_by_id({song_id!r}) returned the seed")
+                seeds = stable_ids[rng.choice(len(stable_ids), 8, replace=False)]
+                batch = agent.recommend_batch(seeds, 10)
+                if (batch["seed_id"] == batch["song_id"]).any():
+                    failures.append("recommend_batch returned a seed as its own recommendation")
+            except Exception as e:
+                failures.append(repr(e))
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"index version {agent.index.version}, {len(agent.index)} live tracks, {len(failures)} failures")
+    for failure in sorted(set(failures))[:10]:
+        print("  ", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,11 @@
-from src.agents.user_input_agent import UserInputAgent
 from src.agents.data_acquisition_agent import DataAcquisitionAgent
 from src.agents.feature_engineering_agent import FeatureEngineeringAgent
 from src.agents.recommendation_agent import RecommendationAgent
-from src.agents.user_output_agent import UserOutputAgent
 from src.agents.playlist_generation_agent import PlaylistGenerationAgent
 
 __all__ = [
-    "UserInputAgent",
     "DataAcquisitionAgent",
     "FeatureEngineeringAgent",
     "RecommendationAgent",
-    "UserOutputAgent",
     "PlaylistGenerationAgent",
-] 
\ No newline at end of file
+]
@@ -1,3 +1,4 @@
 from src.database.pgvector_setup import setup_pgvector
+from src.database.pgvector_store import PgVectorStore
 
-__all__ = ["setup_pgvector"] 
\ No newline at end of file
+__all__ = ["setup_pgvector", "PgVectorStore"]
\ No newline at end of file
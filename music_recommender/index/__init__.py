@@ -0,0 +1,10 @@
+from src.index.attribute_filter import AttributeFilter
+from src.index.feature_index import FeatureIndex, NUMERICAL_FEATURES
+from src.index.ivf import IVFIndex
+from src.index.kernels import KernelSearcher, register_kernel
+from src.index.knn_graph import KNNGraph, build_knn_graph
+from src.index.incremental import IncrementalIndex
+from src.index.quantized import QuantizedIndex
+from src.index.sharded import ShardedSearcher
+
+__all__ = ["AttributeFilter", "FeatureIndex", "IVFIndex", "IncrementalIndex", "KernelSearcher", "KNNGraph", "QuantizedIndex", "ShardedSearcher", "build_knn_graph", "register_kernel", "NUMERICAL_FEATURES"]
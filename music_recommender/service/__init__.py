@@ -0,0 +1,3 @@
+from src.service.recommendation_service import MicroBatcher, RecommendationService
+
+__all__ = ["MicroBatcher", "RecommendationService"]
@@ -1,3 +1,20 @@
-from .data_acquisition_agent import DataAcquisitionAgent
-from .feature_engineering_agent import FeatureEngineeringAgent
-from .recommendation_agent import RecommendationAgent 
\ No newline at end of file
+# Agents are imported on first attribute access: the Spotify and pandas-heavy
+# modules only load when the agent using them is asked for.
+import importlib as _importlib
+
+_EXPORTS = {
+    "DataAcquisitionAgent": ".data_acquisition_agent",
+    "FeatureEngineeringAgent": ".feature_engineering_agent",
+    "RecommendationAgent": ".recommendation_agent",
+    "PlaylistGenerationAgent": ".playlist_generation_agent",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(_importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -1,10 +1,15 @@
 # src/agents/data_acquisition_agent.py
+import numpy as np
 import pandas as pd
 import logging
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials, SpotifyOAuth
-from spotipy import SpotifyException
-from src.utils import cache
+from src.utils import cache, metrics
+from src.utils.catalog_snapshot import is_snapshot, load_snapshot
+from src.utils.catalog_lookup import CatalogLookup
+from src.utils.artist_genres import ArtistGenreResolver
+from src.agents.feature_engineering_agent import CSV_DTYPES, FeatureEngineeringAgent
+
+REQUIRED_COLUMNS = ['song_id', 'title', 'artist', 'genre', 'tempo', 'danceability', 'energy', 'valence', 'acousticness', 'instrumentalness', 'liveness', 'speechiness']  # Include audio features
+DEFAULT_CHUNK_ROWS = 100_000
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -17,8 +22,11 @@ class DataAcquisitionAgent:
 
     def __init__(self, data_filepath: str, spotify_client_id: str = None, spotify_client_secret: str = None, redirect_uri: str = "http://localhost:8888/callback", username:str = None):
         self.data_filepath = data_filepath
-        self.song_data = None
+        self._song_data = None
+        self.snapshot = None  # CatalogSnapshot, when data_filepath is one
+        self.lookup = None  # CatalogLookup, built in load_data
         self.sp = None  # Spotify client object
+        self._genre_resolver = None  # ArtistGenreResolver, created on first use
         self.username = username #Needed for user authorization
         self.redirect_uri = redirect_uri #Needed for user authorization
 
@@ -36,6 +44,8 @@ class DataAcquisitionAgent:
 
     def setup_client_credentials(self, client_id: str, client_secret: str):
         """Sets up Spotify client with Client Credentials flow."""
+        import spotipy  # deferred: offline use never needs the Spotify client
+        from spotipy.oauth2 import SpotifyClientCredentials
         try:
             client_credentials_manager = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret)
             self.sp = spotipy.Spotify(client_credentials_manager=client_credentials_manager)
@@ -45,6 +55,8 @@ class DataAcquisitionAgent:
 
     def setup_user_authorization(self, client_id:str, client_secret:str, redirect_uri:str):
         """Set up Spotify client with User Authorization flow"""
+        import spotipy
+        from spotipy.oauth2 import SpotifyOAuth
         try:
             # Define the scope: what permissions do we want
             scope = "user-library-read user-read-recently-played user-top-read" #Add other scopes if needed.
@@ -58,18 +70,69 @@ class DataAcquisitionAgent:
             logging.error(f"Failed to authenticate user with Spotify (User Authorization): {e}")
             print("Failed to authenticate user with Spotify (User Authorization). Check your Client ID and Secret.")
 
+    def artist_genres(self, artist_ids) -> dict:
+        """Batched, memoised {artist_id: first genre} lookup via Spotify."""
+        if self._genre_resolver is None or self._genre_resolver.sp is not self.sp:
+            self._genre_resolver = ArtistGenreResolver(self.sp)
+        return self._genre_resolver.resolve(artist_ids)
+
+    @property
+    def song_data(self):
+        """The catalog as a DataFrame.  A snapshot is only copied into one on first access."""
+        if self._song_data is None and self.snapshot is not None:
+            self._song_data = self.snapshot.to_frame()
+        return self._song_data
+
+    @song_data.setter
+    def song_data(self, value):
+        # An assigned frame replaces the loaded catalog; its lookup is rebuilt on next use
+        self._song_data = value
+        self.snapshot = None
+        self.lookup = None
+
+    def _catalog_lookup(self) -> CatalogLookup:
+        """Loads the catalog on first use and returns its CatalogLookup."""
+        if self._song_data is None and self.snapshot is None:
+            self.load_data()
+        if self.lookup is None:
+            self.lookup = CatalogLookup(self._song_data["title"], self._song_data["genre"])
+        return self.lookup
+
+    def _rows(self, rows) -> pd.DataFrame:
+        """Catalog rows by position, read straight from the snapshot when there is one."""
+        if self._song_data is None and self.snapshot is not None:
+            return self.snapshot.take(rows)
+        return self.song_data.iloc[rows]
+
+    @metrics.timed("acquisition.load_data")
     def load_data(self) -> None:
-        """Loads song data from the CSV file (same as before, with logging)."""
+        """
+        Loads song data from the CSV file or a memory-mapped catalog snapshot.
+        A snapshot stays mapped: the lookup is built from its columns and
+        result rows are read from it on demand (see `_rows`).
+        """
         try:
-            self.song_data = pd.read_csv(self.data_filepath)
-            required_columns = ['song_id', 'title', 'artist', 'genre', 'tempo', 'danceability', 'energy', 'valence', 'acousticness', 'instrumentalness', 'liveness', 'speechiness']  # Include audio features
-            if not all(col in self.song_data.columns for col in required_columns):
-                missing_cols = set(required_columns) - set(self.song_data.columns)
+            with metrics.span("acquisition.read"):
+                if is_snapshot(self.data_filepath):
+                    self.snapshot = load_snapshot(self.data_filepath)
+                    self._song_data = None
+                    source = self.snapshot
+                else:
+                    self.snapshot = None
+                    self.song_data = source = pd.read_csv(self.data_filepath)
+            if not all(col in source.columns for col in REQUIRED_COLUMNS):
+                missing_cols = set(REQUIRED_COLUMNS) - set(source.columns)
                 logging.error(f"Error: Missing required columns in CSV: {missing_cols}")
                 raise ValueError(f"Missing required columns: {missing_cols}")
-            if self.song_data['song_id'].duplicated().any():
+            song_ids = self.snapshot.keys('song_id') if self.snapshot is not None else source['song_id']
+            if pd.Series(song_ids).duplicated().any():
                 logging.error("Error: Duplicate song IDs found in CSV.")
                 raise ValueError("Duplicate song IDs found.")
+            with metrics.span("acquisition.build_lookup"):
+                if self.snapshot is not None:
+                    self.lookup = CatalogLookup(self.snapshot.column("title"), self.snapshot.column("genre"))
+                else:
+                    self.lookup = CatalogLookup(source["title"], source["genre"])
 
         except FileNotFoundError:
             logging.error(f"Error: Could not find data file at {self.data_filepath}")
@@ -84,34 +147,79 @@ class DataAcquisitionAgent:
             print(f"An unexpected error occurred: {e}")
             exit(1)
 
+    def iter_chunks(self, chunksize: int = DEFAULT_CHUNK_ROWS):
+        """
+        Streams the CSV as DataFrames of at most `chunksize` rows, for dumps
+        too large for load_data.  The header is validated before any row is
+        parsed (source columns may use the aliases FeatureEngineeringAgent
+        maps), only mapped columns are read, with the dtypes in CSV_DTYPES,
+        and duplicate song ids are caught as each chunk arrives.  Integer
+        song ids come out as int64, as load_data would read them.
+        Raises ValueError on a missing column or a duplicate id.
+        """
+        schema = FeatureEngineeringAgent.resolve_schema(pd.read_csv(self.data_filepath, nrows=0).columns)
+        missing_cols = set(REQUIRED_COLUMNS) - set(schema)
+        if missing_cols:
+            logging.error(f"Error: Missing required columns in CSV: {missing_cols}")
+            raise ValueError(f"Missing required columns: {missing_cols}")
+
+        id_column = schema['song_id']
+        dtypes = {schema[col]: dtype for col, dtype in CSV_DTYPES.items() if col in schema}
+        seen = set()
+        numeric_ids = None  # decided by the first chunk, like read_csv's int inference
+        with pd.read_csv(self.data_filepath, usecols=sorted(set(schema.values())), dtype=dtypes, chunksize=chunksize) as reader:
+            for chunk in reader:
+                as_numbers = pd.to_numeric(chunk[id_column], errors='coerce')
+                is_int = pd.api.types.is_integer_dtype(as_numbers.dtype)
+                if numeric_ids is None:
+                    numeric_ids = is_int
+                if numeric_ids:
+                    if not is_int:
+                        raise ValueError("song_id column mixes integer and text ids; load it with load_data instead.")
+                    chunk[id_column] = as_numbers.astype(np.int64)
+                for song_id in chunk[id_column].tolist():
+                    if song_id in seen:
+                        logging.error(f"Error: Duplicate song ID {song_id!r} found in CSV.")
+                        raise ValueError(f"Duplicate song ID found: {song_id!r}")
+                    seen.add(song_id)
+                metrics.inc("acquisition_rows_total", len(chunk))
+                yield chunk
+
+    def genre_rows(self, genre: str):
+        """Row indices (into song_data) of songs in `genre`, case-insensitive."""
+        return self._catalog_lookup().genre_rows(genre)
+
     def get_songs_by_genre(self, genre: str) -> pd.DataFrame:
         """Gets songs of a specific genre (using mock data or Spotify)."""
-        if self.song_data is None:
-          self.load_data()
-        return self.song_data[self.song_data["genre"].str.lower() == genre.lower()]
+        rows = self.genre_rows(genre)  # loads the catalog on first use
+        return self._rows(rows)
+
+    def suggest_titles(self, prefix: str, limit: int = 10) -> list:
+        """Autocomplete: catalog titles starting with `prefix` (case-insensitive)."""
+        return self._catalog_lookup().suggest_titles(prefix, limit)
+
+    def fuzzy_titles(self, query: str, limit: int = 10) -> list:
+        """Catalog titles resembling `query`, as (title, score) pairs."""
+        return self._catalog_lookup().fuzzy_titles(query, limit)
 
 
     def get_song_by_title(self, title: str) -> pd.DataFrame:
         """Gets a song by its title (using mock data OR Spotify)."""
         if self.sp:  # Try Spotify first if authenticated
             try:
+                metrics.inc("spotify_calls_total", endpoint="search")
                 results = self.sp.search(q=f"track:{title}", type='track', limit=1)
                 tracks = results['tracks']['items']
                 if tracks:
                     track = tracks[0]
+                    artist_id = track['artists'][0]['id']
                     track_info = {
                         'song_id': track['id'],
                         'title': track['name'],
                         'artist': track['artists'][0]['name'],
-                        'genre': ""
+                        # First genre of artist (optional, "" if unavailable)
+                        'genre': self.artist_genres([artist_id]).get(artist_id, ""),
                     }
-                    # Attempt to get first genre of artist (optional)
-                    try:
-                        artist_info = self.sp.artist(track['artists'][0]['id'])
-                        if artist_info.get('genres'):
-                            track_info['genre'] = artist_info['genres'][0]
-                    except Exception:
-                        pass
                     return pd.DataFrame([track_info])
                  
             except Exception as e:
@@ -120,10 +228,9 @@ class DataAcquisitionAgent:
                 return pd.DataFrame()
 
         # Fallback to mock data
-        if self.song_data is None:
-            self.load_data()
-        return self.song_data[self.song_data["title"].str.lower() == title.lower()]
+        return self._rows(self._catalog_lookup().title_rows(title))
 
+    @metrics.timed("acquisition.spotify_recommendations")
     def get_spotify_recommendations(self, user_input: str = None, seed_track_id: str = None) -> pd.DataFrame:
         """Fetch recommendations from Spotify.
 
@@ -135,6 +242,7 @@ class DataAcquisitionAgent:
         # Only attempt if we have a Spotify client
         if not self.sp:
             return pd.DataFrame()
+        from spotipy import SpotifyException
 
         try:
             if seed_track_id:
@@ -142,11 +250,14 @@ class DataAcquisitionAgent:
                 recs=cache.get(cache_key)
                 if not recs:
                     try:
+                        metrics.inc("spotify_calls_total", endpoint="recommendations")
                         recs = self.sp.recommendations(seed_tracks=[seed_track_id], limit=10, market='US')
                     except SpotifyException:
                         # Maybe the track isn't available; try artist instead
                         try:
+                            metrics.inc("spotify_calls_total", endpoint="track")
                             artist_id=self.sp.track(seed_track_id)['artists'][0]['id']
+                            metrics.inc("spotify_calls_total", endpoint="recommendations")
                             recs=self.sp.recommendations(seed_artists=[artist_id], limit=10, market='US')
                         except SpotifyException:
                             recs=None
@@ -154,6 +265,7 @@ class DataAcquisitionAgent:
                         cache.set(cache_key, recs)
             else:
                 # Try track title search first
+                metrics.inc("spotify_calls_total", endpoint="search")
                 results = self.sp.search(q=f"track:{user_input}", type='track', limit=1)
                 tracks = results['tracks']['items']
                 if tracks:
@@ -163,6 +275,7 @@ class DataAcquisitionAgent:
                     if cached:
                         recs=cached
                     else:
+                        metrics.inc("spotify_calls_total", endpoint="recommendations")
                         recs = self.sp.recommendations(seed_tracks=[seed_track_id], limit=10, market='US')
                         cache.set(cache_key, recs)
                 else:
@@ -170,33 +283,29 @@ class DataAcquisitionAgent:
                     cache_key=f"recs_genre_{user_input.lower()}"
                     recs=cache.get(cache_key)
                     if not recs:
+                        metrics.inc("spotify_calls_total", endpoint="recommendations")
                         recs = self.sp.recommendations(seed_genres=[user_input.lower()], limit=10, market='US')
                         cache.set(cache_key, recs)
 
+            # One batched lookup for all artists instead of one call per track
+            genres = self.artist_genres(track['artists'][0]['id'] for track in recs['tracks'])
             rows = []
             for track in recs['tracks']:
-                genre_guess = ""
-                try:
-                    artist_info = self.sp.artist(track['artists'][0]['id'])
-                    if artist_info.get('genres'):
-                        genre_guess = artist_info['genres'][0]
-                except Exception:
-                    pass
                 rows.append({
                     'song_id': track['id'],
                     'title': track['name'],
                     'artist': track['artists'][0]['name'],
-                    'genre': genre_guess,
+                    'genre': genres.get(track['artists'][0]['id'], ""),
                 })
             return pd.DataFrame(rows)
         except Exception as e:
             logging.error(f"Error fetching recommendations via Spotify: {e}")
             return pd.DataFrame()
 
+    @metrics.timed("acquisition.run")
     def run(self, user_input: str) -> pd.DataFrame:
         """Runs the agent, trying Spotify first, then falling back to mock data."""
-        if self.song_data is None:
-            self.load_data()
+        self._catalog_lookup()  # loads the catalog on first use
 
         # Sanitize user input (remove leading/trailing whitespace)
         user_input = user_input.strip()
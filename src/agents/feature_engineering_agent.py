@@ -1,7 +1,81 @@
 # src/agents/feature_engineering_agent.py
 
+import numpy as np
 import pandas as pd
 
+from src.utils import metrics
+from src.index.feature_index import NUMERICAL_FEATURES
+
+SCHEMA_MAPPING = {
+    "track_id": "song_id",
+    "id": "song_id",
+    "track_name": "title",
+    "name": "title",
+    "track_genre": "genre",
+    "artists": "artist",
+}
+
+FEATURE_COLS = [
+    "song_id", "title", "artist", "genre", "year", "popularity",
+    "explicit", "duration_ms", "tempo", "danceability", "energy",
+    "valence", "loudness", "acousticness", "instrumentalness",
+    "liveness", "speechiness", "mode", "key",
+]
+
+# Explicit parse dtypes for streamed CSV chunks (see DataAcquisitionAgent.iter_chunks):
+# audio features parse as float64 exactly as in load_data, integer columns to nullable ints (plain
+# ints again once compacted, unless values are missing), text stays text in every
+# chunk.  song_id is read as text and typed per file by iter_chunks.
+CSV_DTYPES = {
+    **{name: "float64" for name in NUMERICAL_FEATURES},
+    "year": "Int32", "popularity": "Int16", "duration_ms": "Int64", "mode": "Int8", "key": "Int8",
+    "song_id": str, "title": str, "artist": str, "genre": str,
+}
+
+
+class CompactFeatures:
+    """
+    Compact feature representation: a contiguous float32 matrix of the
+    audio features plus categorical / downcast metadata columns.
+    """
+
+    def __init__(self, matrix: np.ndarray, feature_names: list, metadata: pd.DataFrame):
+        self.matrix = matrix
+        self.feature_names = feature_names
+        self.metadata = metadata
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + int(self.metadata.memory_usage(deep=True).sum())
+
+    def to_frame(self) -> pd.DataFrame:
+        """Same columns as FeatureEngineeringAgent.get_features."""
+        frame = self.metadata.copy()
+        for i, name in enumerate(self.feature_names):
+            frame[name] = self.matrix[:, i]
+        return frame[[c for c in FEATURE_COLS if c in frame.columns]]
+
+
+def _compact_column(series: pd.Series):
+    """Categorical codes for repetitive strings, smallest dtype for numbers."""
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series.to_numpy()
+    if pd.api.types.is_integer_dtype(series.dtype):
+        if series.hasnans:
+            # Missing values in a (nullable) int column: float with NaN, as read_csv infers
+            return series.to_numpy(dtype=np.float32, na_value=np.nan)
+        return pd.to_numeric(series, downcast="integer").to_numpy()
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.to_numpy(dtype=np.float32)
+    categorical = pd.Categorical(series)
+    if len(categorical.categories) > len(series) // 2:
+        # Mostly-unique columns (ids, titles): codes would only add memory
+        return series.array
+    return categorical
+
 
 class FeatureEngineeringAgent:
     """
@@ -11,36 +85,64 @@ class FeatureEngineeringAgent:
     def __init__(self):
         pass
 
+    @staticmethod
+    def resolve_schema(columns) -> dict:
+        """
+        Maps each internal column name to the source column providing it,
+        e.g. {"song_id": "track_id", "title": "title", ...}.
+        """
+        columns = list(columns)
+        sources = {col: col for col in columns}
+        for old, new in SCHEMA_MAPPING.items():
+            # Aliases are checked against the original columns, so a later alias wins.
+            if old in columns and new not in columns:
+                sources[new] = old
+        return {col: sources[col] for col in FEATURE_COLS if col in sources}
+
+    @metrics.timed("feature_engineering.get_features")
     def get_features(self, song_data: pd.DataFrame) -> pd.DataFrame:
         """
         Gets the features for the given song data, mapping columns
         from various schemas to a consistent internal format.
         """
-        df = song_data.copy()
-        cols = df.columns
-
-        mapping = {
-            "track_id": "song_id",
-            "id": "song_id",
-            "track_name": "title",
-            "name": "title",
-            "track_genre": "genre",
-            "artists": "artist",
-        }
-        for old, new in mapping.items():
-            if old in cols and new not in cols:
-                df[new] = df[old]
-
-        feature_cols = [
-            "song_id", "title", "artist", "genre", "year", "popularity",
-            "explicit", "duration_ms", "tempo", "danceability", "energy",
-            "valence", "loudness", "acousticness", "instrumentalness",
-            "liveness", "speechiness", "mode", "key",
-        ]
-
-        existing_features = [col for col in feature_cols if col in df.columns]
-        return df[existing_features]
-
-    def run(self, song_data: pd.DataFrame) -> pd.DataFrame:
+        schema = self.resolve_schema(song_data.columns)
+        df = song_data[list(schema.values())]
+        df.columns = list(schema.keys())
+        return df
+
+    @metrics.timed("feature_engineering.get_compact_features")
+    def get_compact_features(self, song_data: pd.DataFrame, dtype=np.float32) -> CompactFeatures:
+        """
+        Like get_features, but without intermediate DataFrame copies: the
+        audio features are written straight into one `dtype` matrix and the
+        remaining columns are categorical-coded or downcast.
+        """
+        schema = self.resolve_schema(song_data.columns)
+        feature_names = [f for f in NUMERICAL_FEATURES if f in schema]
+
+        matrix = np.empty((len(song_data), len(feature_names)), dtype=dtype)
+        for i, name in enumerate(feature_names):
+            matrix[:, i] = song_data[schema[name]].to_numpy(dtype=dtype, na_value=np.nan)
+
+        metadata = pd.DataFrame({
+            name: _compact_column(song_data[source])
+            for name, source in schema.items() if name not in feature_names
+        }, index=pd.RangeIndex(len(song_data)))
+        return CompactFeatures(matrix, feature_names, metadata)
+
+    def iter_compact_features(self, chunks, dtype=np.float64):
+        """
+        Maps a stream of raw DataFrame chunks (e.g. DataAcquisitionAgent.iter_chunks)
+        to CompactFeatures one chunk at a time, for FeatureIndex.from_compact_chunks.
+        float64 features give an index identical to FeatureIndex.build; float32
+        halves the index builder's raw buffer.
+        """
+        for chunk in chunks:
+            yield self.get_compact_features(chunk, dtype)
+
+    @metrics.timed("feature_engineering.run")
+    def run(self, song_data: pd.DataFrame, compact: bool = False):
         """Runs the agent to engineer features."""
-        return self.get_features(song_data)
\ No newline at end of file
+        if compact:
+            return self.get_compact_features(song_data)
+        return self.get_features(song_data)
@@ -0,0 +1,107 @@
+# src/agents/playlist_generation_agent.py
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.utils import metrics
+from src.index.feature_index import FeatureIndex
+from src.index.knn_graph import KNNGraph
+
+# Features whose step-to-step change is penalised, with default weights
+TRANSITION_FEATURES = {"tempo": 0.5, "energy": 0.5}
+
+
+class PlaylistGenerationAgent:
+    """
+    Builds playlists by walking a precomputed neighbour graph.
+
+    Each step extends the playlist with one of the current track's graph
+    neighbours, scored by similarity minus a penalty on the tempo/energy
+    jump (measured in standard deviations of the catalog).  A beam search
+    keeps the `beam_width` best partial playlists, so one bad greedy step
+    does not ruin the rest.  Tracks and artists never repeat.
+    """
+
+    def __init__(self, index: FeatureIndex, graph: KNNGraph, beam_width: int = 8, transition_weights: dict = None):
+        if graph.index_version is not None and graph.index_version != index.version:
+            raise ValueError("Neighbour graph was built for a different feature index.")
+        self.index = index
+        self.graph = graph
+        self.beam_width = beam_width
+        self.transition_weights = dict(TRANSITION_FEATURES if transition_weights is None else transition_weights)
+
+        # Transition features standardised with the index scaler, so weights are unit-free
+        weights, columns = [], []
+        for name, weight in self.transition_weights.items():
+            if name in index.feature_names and name in index.metadata.columns:
+                i = index.feature_names.index(name)
+                values = index.metadata[name].to_numpy(dtype=np.float64, na_value=np.nan)
+                columns.append(np.nan_to_num((values - index.mean[i]) / index.scale[i]))
+                weights.append(weight)
+        self._transition = np.stack(columns, axis=1).astype(np.float32) if columns else np.zeros((len(index), 0), dtype=np.float32)
+        self._weights = np.asarray(weights, dtype=np.float32)
+
+        if "artist" in index.metadata.columns:
+            self._artist = pd.factorize(index.metadata["artist"].astype(object).fillna(""))[0]
+        else:
+            self._artist = np.arange(len(index))
+
+    def _candidates(self, playlist: list, artists: set):
+        """Unused, artist-new graph neighbours of the playlist's last track."""
+        last = playlist[-1]
+        rows = np.asarray(self.graph.neighbours[last])
+        sims = np.asarray(self.graph.scores[last])
+        keep = rows >= 0
+        keep &= ~np.isin(rows, playlist)
+        keep &= ~np.isin(self._artist[np.maximum(rows, 0)], list(artists))
+        if not keep.any():
+            # Dead end in the graph: fall back to a wider exact search for this track
+            rows, sims = self.index.search(self.index.vectors(last), 4 * self.graph.k + len(playlist), exclude=[last])
+            rows, sims = rows[0], sims[0]
+            keep = rows >= 0
+            keep &= ~np.isin(rows, playlist)
+            keep &= ~np.isin(self._artist[np.maximum(rows, 0)], list(artists))
+        return rows[keep], sims[keep]
+
+    @metrics.timed("playlist.generate")
+    def generate(self, seed_id, length: int = 20, beam_width: int = None) -> pd.DataFrame:
+        """
+        Returns a playlist of up to `length` tracks starting with `seed_id`:
+        the catalog rows in order, plus `position` and `transition_similarity`
+        (similarity to the previous track).  Raises KeyError for unknown seeds.
+        """
+        beam_width = beam_width or self.beam_width
+        seed = self.index.row_of(seed_id)
+        # Each beam: (score, rows, artists, transition similarities)
+        beams = [(0.0, [seed], {self._artist[seed]}, [np.nan])]
+
+        for _ in range(length - 1):
+            expansions = []
+            for score, playlist, artists, steps in beams:
+                rows, sims = self._candidates(playlist, artists)
+                if len(rows) == 0:
+                    continue
+                jump = np.abs(self._transition[rows] - self._transition[playlist[-1]]) @ self._weights
+                gains = sims - jump
+                best = np.argsort(-gains, kind="stable")[:beam_width]
+                expansions.extend((score + float(gains[j]), playlist, artists, steps, int(rows[j]), float(sims[j])) for j in best)
+            if not expansions:
+                logging.warning(f"Playlist for {seed_id} stopped at {len(beams[0][1])} tracks: no unused neighbours left.")
+                break
+            expansions.sort(key=lambda e: -e[0])
+            beams = [
+                (score, playlist + [row], artists | {self._artist[row]}, steps + [sim])
+                for score, playlist, artists, steps, row, sim in expansions[:beam_width]
+            ]
+
+        _, playlist, _, steps = beams[0]
+        tracks = self.index.metadata_rows(playlist).copy()
+        tracks.insert(0, "position", np.arange(1, len(playlist) + 1))
+        tracks["transition_similarity"] = steps
+        return tracks
+
+    def run(self, seed_id, length: int = 20) -> pd.DataFrame:
+        """Runs the agent to generate a playlist."""
+        return self.generate(seed_id, length)
@@ -1,12 +1,20 @@
 # src/agents/recommendation_agent.py
 
+import numpy as np
 import pandas as pd
-import random
-from sklearn.preprocessing import StandardScaler  # Feature scaling
-from sklearn.metrics.pairwise import cosine_similarity  # Cosine similarity
 
 # Note: calculate_similarity still exists for legacy use, but we now use cosine similarity here.
 from src.utils.helpers import calculate_similarity
+from src.utils import metrics
+from src.utils.result_cache import ResultCache, freeze, freeze_params
+from src.agents.feature_engineering_agent import CompactFeatures
+from src.index.feature_index import FeatureIndex
+from src.index.incremental import IncrementalIndex
+from src.index.ivf import IVFIndex
+from src.index.kernels import KernelSearcher
+from src.index.knn_graph import KNNGraph
+from src.index.quantized import QuantizedIndex
+from src.index.sharded import ShardedSearcher
 
 
 class RecommendationAgent:
@@ -14,54 +22,317 @@ class RecommendationAgent:
     Recommends songs using cosine similarity on scaled audio features.
     """
 
-    def __init__(self):
-        pass
+    def __init__(self, index: FeatureIndex = None, ann_index: IVFIndex = None, store=None, result_cache: ResultCache = None):
+        self.index = index
+        self.ann_index = ann_index
+        self.store = store  # optional PgVectorStore (src/database/pgvector_store.py)
+        self.graph = None  # optional precomputed KNNGraph, see load_graph
+        self.sharded = None  # optional ShardedSearcher, see start_sharded_search
+        self.result_cache = result_cache  # optional memo for recommend_by_id, keyed on index.version
+
+    def build_index(self, song_features, incremental: bool = False) -> FeatureIndex:
+        """
+        Builds (and keeps) a persistent feature index for the whole catalog,
+        from a features DataFrame or CompactFeatures (e.g. a snapshot's
+        `compact_features()`).  With `incremental=True` the index accepts
+        add_songs/delete_songs without a rebuild (see IncrementalIndex).
+        """
+        if incremental and isinstance(song_features, CompactFeatures):
+            song_features = song_features.to_frame()  # IncrementalIndex keeps the raw feature columns
+        if incremental:
+            self.index = IncrementalIndex.build(song_features)
+        elif isinstance(song_features, CompactFeatures):
+            self.index = FeatureIndex.from_compact(song_features)
+        else:
+            self.index = FeatureIndex.build(song_features)
+        self.ann_index = None
+        self.graph = None
+        self.stop_sharded_search()
+        return self.index
+
+    def load_index(self, path: str) -> FeatureIndex:
+        """Loads a feature index saved with FeatureIndex.save."""
+        self.index = FeatureIndex.load(path)
+        self.ann_index = None
+        self.graph = None
+        self.stop_sharded_search()
+        return self.index
+
+    def add_songs(self, song_features: pd.DataFrame):
+        """Adds or replaces catalog tracks (by song_id) in an incremental index."""
+        self._incremental_index().upsert(song_features)
+
+    def delete_songs(self, song_ids):
+        """Removes catalog tracks from an incremental index."""
+        self._incremental_index().delete(song_ids)
+
+    def _incremental_index(self) -> IncrementalIndex:
+        if not isinstance(self.index, IncrementalIndex):
+            raise ValueError("Catalog updates need an incremental index; call build_index(..., incremental=True).")
+        return self.index
+
+    def load_graph(self, path: str) -> KNNGraph:
+        """
+        Loads a neighbour graph built by src.index.knn_graph for the current
+        index; recommend_by_id then answers from it when k fits.
+        """
+        if self.index is None:
+            raise ValueError("No feature index loaded; call build_index() or load_index() first.")
+        graph = KNNGraph.load(path)
+        if graph.index_version != self.index.version:
+            raise ValueError(f"Neighbour graph at {path} was built for a different feature index.")
+        self.graph = graph
+        return graph
+
+    def start_sharded_search(self, n_workers: int = None) -> ShardedSearcher:
+        """
+        Starts a persistent process pool that shares the index matrix and
+        serves exact searches shard-parallel (recommend_by_id/recommend_batch
+        use it until stop_sharded_search or the index changes).
+        """
+        if not isinstance(self.index, FeatureIndex):
+            raise ValueError("Sharded search needs a static feature index; call build_index() or load_index() first.")
+        self.stop_sharded_search()
+        self.sharded = ShardedSearcher(self.index, n_workers)
+        return self.sharded
+
+    def stop_sharded_search(self):
+        if self.sharded is not None:
+            self.sharded.close()
+            self.sharded = None
+
+    def build_ann_index(self, method: str = "ivf", **kwargs):
+        """
+        Builds the approximate index used by `approximate=True` queries over
+        the current feature index: "ivf" (IVFIndex.build: n_lists, n_probe,
+        ...) or "int8" (QuantizedIndex.build: rerank_factor, ...).
+        """
+        if self.index is None:
+            raise ValueError("No feature index loaded; call build_index() or load_index() first.")
+        if not isinstance(self.index, FeatureIndex):
+            raise ValueError("Approximate indexes need a static feature index; incremental indexes are searched exactly.")
+        if method == "ivf":
+            self.ann_index = IVFIndex.build(self.index, **kwargs)
+        elif method == "int8":
+            self.ann_index = QuantizedIndex.build(self.index, **kwargs)
+        else:
+            raise ValueError(f"Unknown approximate index method: {method}")
+        return self.ann_index
+
+    def load_ann_index(self, path: str) -> QuantizedIndex:
+        """
+        Loads an int8 index saved with QuantizedIndex.save for the current
+        feature index.  Its exact vectors are memory-mapped and the feature
+        index's matrix is switched to the same mapping, so the process keeps
+        only the int8 codes resident; exact queries and re-ranking read the
+        shared page cache.
+        """
+        if self.index is None:
+            raise ValueError("No feature index loaded; call build_index() or load_index() first.")
+        if not isinstance(self.index, FeatureIndex):
+            raise ValueError("Approximate indexes need a static feature index; incremental indexes are searched exactly.")
+        ann_index = QuantizedIndex.load(path)
+        if ann_index.index_version != self.index.version:
+            raise ValueError(f"Quantized index at {path} was built for a different feature index.")
+        self.index.matrix = np.asarray(ann_index.exact)  # same float32 rows, now file-backed
+        self.ann_index = ann_index
+        return ann_index
 
     def recommend_songs(
         self,
         song_features: pd.DataFrame,
         num_recommendations: int = 5,
         similarity_threshold: float = 0.0,
+        filters: dict = None,
+        kernel: str = "cosine",
+        kernel_params: dict = None,
     ) -> pd.DataFrame:
         """
-        Recommends songs based on feature similarity.
+        Recommends songs based on feature similarity.  The first row of
+        `song_features` is the seed; the rest of the frame is the catalog.
+
+        `filters` restricts the candidates, e.g. {"genre": "rock",
+        "decade": 1990, "explicit": False, "popularity": (50, None)}; see
+        AttributeFilter for the accepted forms.  `kernel` picks the
+        similarity from src.index.kernels ("cosine", "euclidean_inverse",
+        "weighted_cosine" with kernel_params={"weights": {...}}, ...).
         """
         if song_features.empty:
             return pd.DataFrame()
 
-        all_songs = song_features.copy()
+        try:
+            with metrics.span("recommendation.build_index"):
+                index = FeatureIndex.build(song_features)
+        except ValueError:
+            return pd.DataFrame()
 
-        numerical_features = [
-            "tempo", "danceability", "energy", "valence", "loudness",
-            "acousticness", "instrumentalness", "liveness", "speechiness",
-        ]
-        
-        existing_numerical_features = [
-            f for f in numerical_features if f in all_songs.columns
-        ]
+        searcher = self._searcher(False, kernel, kernel_params, index)
+        return self._recommend(index, 0, num_recommendations, similarity_threshold, searcher, index.filter_mask(filters))
 
-        if not existing_numerical_features:
-            return pd.DataFrame()
+    @metrics.timed("recommendation.recommend_by_id")
+    def recommend_by_id(
+        self,
+        song_id,
+        num_recommendations: int = 5,
+        similarity_threshold: float = 0.0,
+        approximate: bool = False,
+        filters: dict = None,
+        kernel: str = "cosine",
+        kernel_params: dict = None,
+    ) -> pd.DataFrame:
+        """
+        Recommends songs similar to `song_id` using the prebuilt index.
+        With `approximate=True` the IVF index is searched instead of the
+        whole catalog.  `filters` and `kernel` are as for recommend_songs.
+        With a result_cache, repeated requests are answered from memory
+        until the index changes.
+        """
+        if self.index is None:
+            raise ValueError("No feature index loaded; call build_index() or load_index() first.")
+        if self.result_cache is None:
+            return self._recommend_by_id(song_id, num_recommendations, similarity_threshold, approximate, filters, kernel, kernel_params)
 
-        all_songs[existing_numerical_features] = StandardScaler().fit_transform(
-            all_songs[existing_numerical_features]
+        key = (
+            "by_id", song_id, num_recommendations, similarity_threshold,
+            (getattr(self.ann_index, "build_id", None), getattr(self.ann_index, "n_probe", None), getattr(self.ann_index, "rerank_factor", None)) if approximate else None,
+            tuple(self.index.feature_names), freeze(filters), kernel, freeze_params(kernel_params),
+        )
+        recommended_songs = self.result_cache.get_or_compute(
+            self.index.version, key,
+            lambda: self._recommend_by_id(song_id, num_recommendations, similarity_threshold, approximate, filters, kernel, kernel_params),
         )
+        return recommended_songs.copy()
+
+    def _recommend_by_id(self, song_id, num_recommendations: int, similarity_threshold: float, approximate: bool, filters: dict, kernel: str, kernel_params: dict) -> pd.DataFrame:
+        # Rows are resolved, searched and materialised under one pin, so a
+        # concurrent compaction cannot renumber them in between
+        with self.index.pinned():
+            try:
+                row = self.index.row_of(song_id)
+            except KeyError:
+                return pd.DataFrame()
+
+            # The graph holds plain cosine neighbours, and only while the index is unchanged since it was built
+            plain = not filters and kernel == "cosine" and not kernel_params
+            if plain and self.graph is not None and num_recommendations <= self.graph.k and self.graph.index_version == self.index.version:
+                with metrics.span("recommendation.graph_lookup"):
+                    rows, _, sims = self.graph.neighbours_of(song_id, num_recommendations, similarity_threshold)
+                recommended_songs = self.index.metadata_rows(rows).copy()
+                recommended_songs["similarity"] = sims.astype(float)
+                return recommended_songs
+
+            mask = self.index.filter_mask(filters)
+            searcher = self._searcher(approximate, kernel, kernel_params)
+            return self._recommend(self.index, row, num_recommendations, similarity_threshold, searcher, mask)
+
+    @metrics.timed("recommendation.recommend_from_store")
+    def recommend_from_store(
+        self,
+        song_id,
+        num_recommendations: int = 5,
+        similarity_threshold: float = 0.0,
+        filters: dict = None,
+    ) -> pd.DataFrame:
+        """
+        Recommends songs similar to `song_id` by querying the pgvector
+        store instead of an in-memory index.  `filters` are SQL prefilters
+        on catalog columns (see PgVectorStore.recommend).
+        """
+        if self.store is None:
+            raise ValueError("No pgvector store configured.")
+        rows = self.store.recommend(song_id, num_recommendations, similarity_threshold, filters)
+        frame = pd.DataFrame(rows, columns=["song_id", "title", "artist", "genre", "similarity"])
+        if self.index is not None and np.issubdtype(self.index.song_ids.dtype, np.integer):
+            frame["song_id"] = frame["song_id"].astype(self.index.song_ids.dtype)  # stored as TEXT
+        return frame
+
+    @metrics.timed("recommendation.recommend_batch")
+    def recommend_batch(
+        self,
+        seed_ids,
+        k: int = 5,
+        threshold: float = 0.0,
+        block_size: int = 256,
+        approximate: bool = False,
+        filters: dict = None,
+        kernel: str = "cosine",
+        kernel_params: dict = None,
+    ) -> pd.DataFrame:
+        """
+        Recommends songs for many seeds at once using the prebuilt index.
+
+        Seeds are scored `block_size` at a time with one matrix multiply per
+        block.  Returns a long frame with columns seed_id, rank (1-based),
+        song_id and similarity; unknown seeds produce no rows.  `filters`
+        and `kernel` apply to every seed, as for recommend_songs.
+        """
+        if self.index is None:
+            raise ValueError("No feature index loaded; call build_index() or load_index() first.")
+
+        seed_ids = np.asarray(list(seed_ids))
+        with self.index.pinned():
+            mask = self.index.filter_mask(filters)
+            searcher = self._searcher(approximate, kernel, kernel_params)
+            seed_rows = self.index.rows_for(seed_ids)
+            known = seed_rows >= 0
+            seed_ids, seed_rows = seed_ids[known], seed_rows[known]
+
+            seed_parts, rank_parts, row_parts, sim_parts = [], [], [], []
+            for start in range(0, len(seed_rows), block_size):
+                block = seed_rows[start:start + block_size]
+                rows, sims = searcher.search(self._queries(searcher, self.index, block), k, threshold, exclude=block, mask=mask)
+                seed_pos, rank = np.nonzero(rows >= 0)
+                seed_parts.append(seed_ids[start + seed_pos])
+                rank_parts.append(rank + 1)
+                row_parts.append(rows[seed_pos, rank])
+                sim_parts.append(sims[seed_pos, rank])
+
+            if not seed_parts:
+                return pd.DataFrame(columns=["seed_id", "rank", "song_id", "similarity"])
+            song_ids = self.index.ids(np.concatenate(row_parts))
+
+        return pd.DataFrame({
+            "seed_id": np.concatenate(seed_parts),
+            "rank": np.concatenate(rank_parts).astype(np.int32),
+            "song_id": song_ids,
+            "similarity": np.concatenate(sim_parts),
+        })
+
+    def _searcher(self, approximate: bool, kernel: str = "cosine", kernel_params: dict = None, index=None):
+        index = index or self.index
+        if kernel != "cosine" or kernel_params:
+            if approximate:
+                raise ValueError("Approximate indexes only support the cosine kernel.")
+            if not isinstance(index, FeatureIndex):
+                raise ValueError("Similarity kernels need a static feature index.")
+            return KernelSearcher(index, kernel, **(kernel_params or {}))
+        if index is not self.index:
+            return index
+        if not approximate:
+            if self.sharded is not None and self.sharded.version == self.index.version:
+                return self.sharded
+            return self.index
+        if self.ann_index is None:
+            raise ValueError("No ANN index built; call build_ann_index() first.")
+        return self.ann_index
 
-        feature_matrix = all_songs[existing_numerical_features].values
-        reference_vector = feature_matrix[0].reshape(1, -1)
-        similarities = cosine_similarity(reference_vector, feature_matrix).flatten()
-        all_songs["similarity"] = similarities
+    @staticmethod
+    def _queries(searcher, index, rows) -> np.ndarray:
+        # Kernel searchers may score in another space than the normalised matrix
+        return searcher.vectors(rows) if isinstance(searcher, KernelSearcher) else index.vectors(rows)
 
-        recommended_songs = all_songs.sort_values(
-            by="similarity", ascending=False
-        ).iloc[1:]
-        
-        recommended_songs = recommended_songs[
-            recommended_songs["similarity"] >= similarity_threshold
-        ]
+    def _recommend(self, index: FeatureIndex, row: int, num_recommendations: int, similarity_threshold: float, searcher=None, mask=None) -> pd.DataFrame:
+        searcher = searcher or index
+        with metrics.span("recommendation.search"):
+            rows, sims = searcher.search(self._queries(searcher, index, row), num_recommendations, similarity_threshold, exclude=[row], mask=mask)
+        found = rows[0] >= 0
 
-        return recommended_songs.head(num_recommendations)
+        with metrics.span("recommendation.materialise"):
+            recommended_songs = index.metadata_rows(rows[0][found]).copy()
+        recommended_songs["similarity"] = sims[0][found].astype(float)
+        return recommended_songs
 
+    @metrics.timed("recommendation.run")
     def run(self, song_features: pd.DataFrame) -> pd.DataFrame:
         """Runs the agent to generate recommendations."""
-        return self.recommend_songs(song_features)
\ No newline at end of file
+        return self.recommend_songs(song_features)
@@ -1,8 +1,9 @@
 # database/pgvector_setup.py
 import psycopg2
+from psycopg2 import sql
 
-def setup_pgvector(db_url):
-    """Sets up the PgVector database."""
+def setup_pgvector(db_url, table="songs"):
+    """Sets up the PgVector database, creating the songs table under the name `table`."""
     try:
         conn = psycopg2.connect(db_url)
         cur = conn.cursor()
@@ -11,8 +12,8 @@ def setup_pgvector(db_url):
         cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
 
         # Create the songs table (adjust columns as needed)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS songs (
+        cur.execute(sql.SQL("""
+            CREATE TABLE IF NOT EXISTS {} (
                 song_id TEXT PRIMARY KEY,
                 title TEXT,
                 artist TEXT,
@@ -27,7 +28,7 @@ def setup_pgvector(db_url):
                 speechiness REAL,
                 gemini_embedding vector(768)  -- Adjust dimension if needed
             );
-        """)
+        """).format(sql.Identifier(table)))
 
         conn.commit()
         cur.close()
@@ -0,0 +1,248 @@
+# database/pgvector_store.py
+import csv
+import io
+import logging
+
+import numpy as np
+import pandas as pd
+from psycopg2 import pool, sql
+
+from src.database.pgvector_setup import setup_pgvector
+from src.index.attribute_filter import DERIVED_RANGES
+
+# Catalog columns copied into the songs table when the index metadata has them
+CATALOG_COLUMNS = {
+    "title": "TEXT",
+    "artist": "TEXT",
+    "genre": "TEXT",
+    "year": "INTEGER",
+    "popularity": "INTEGER",
+    "explicit": "BOOLEAN",
+    "tempo": "REAL",
+    "danceability": "REAL",
+    "energy": "REAL",
+    "valence": "REAL",
+    "acousticness": "REAL",
+    "instrumentalness": "REAL",
+    "liveness": "REAL",
+    "speechiness": "REAL",
+}
+VECTOR_COLUMN = "audio_embedding"
+
+
+def _vector_literal(row) -> str:
+    return "[" + ",".join(f"{v:.7g}" for v in row) + "]"
+
+
+def _param(value):
+    """Plain Python value for psycopg2, which cannot adapt NumPy scalars."""
+    if isinstance(value, (list, set, tuple, np.ndarray)):
+        return [_param(v) for v in value]
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _copy_fields(series, col_type: str) -> list:
+    """One metadata column as COPY csv fields: missing values (any NaN/NA) empty, INTEGER columns as ints."""
+    if col_type == "INTEGER":
+        series = pd.to_numeric(series).round().astype("Int64")  # e.g. year read as float because of gaps
+    return series.astype(object).where(series.notna(), "").tolist()
+
+
+class PgVectorStore:
+    """
+    pgvector-backed similarity search over the scaled audio features.
+
+    The catalog and the L2-normalised feature vectors from a FeatureIndex
+    are bulk-loaded with COPY (one staging table per batch, upserted into
+    `songs`).  Top-k queries use cosine distance through an HNSW or IVFFlat
+    index and a pooled connection, so catalogs larger than RAM can be
+    served.  `filters` give optional SQL prefilters on catalog columns.
+
+    song_id is stored as TEXT; with `int_ids` (set by load_index for an
+    index with integer ids) ids are returned as ints, as the index has them.
+    """
+
+    def __init__(self, db_url: str, dim: int = 9, minconn: int = 1, maxconn: int = 8, table: str = "songs", int_ids: bool = False):
+        self.db_url = db_url
+        self.dim = dim
+        self.table = table
+        self.int_ids = int_ids
+        self.pool = pool.ThreadedConnectionPool(minconn, maxconn, db_url)
+
+    def _run(self, fn):
+        conn = self.pool.getconn()
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    return fn(cur)
+        finally:
+            self.pool.putconn(conn)
+
+    def ensure_schema(self):
+        """Creates `self.table` (via setup_pgvector) and its vector/prefilter columns."""
+        setup_pgvector(self.db_url, self.table)
+
+        def _alter(cur):
+            table = sql.Identifier(self.table)
+            for col, col_type in CATALOG_COLUMNS.items():
+                cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} " + col_type).format(table, sql.Identifier(col)))
+            cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} vector({})").format(
+                table, sql.Identifier(VECTOR_COLUMN), sql.Literal(self.dim)))
+        self._run(_alter)
+
+    def load_index(self, index, batch_size: int = 50_000) -> int:
+        """
+        Bulk-loads `index` (a FeatureIndex) with COPY, `batch_size` rows per
+        transaction.  Existing song_ids are updated.  Returns rows written.
+        """
+        if index.matrix.shape[1] != self.dim:
+            raise ValueError(f"Index has {index.matrix.shape[1]} features, store expects {self.dim}.")
+        self.int_ids = bool(np.issubdtype(index.song_ids.dtype, np.integer))
+
+        columns = [c for c in CATALOG_COLUMNS if c in index.metadata.columns]
+        all_columns = ["song_id"] + columns + [VECTOR_COLUMN]
+        table = sql.Identifier(self.table)
+        stage = sql.Identifier(f"{self.table}_stage")
+        column_list = sql.SQL(", ").join(map(sql.Identifier, all_columns))
+        updates = sql.SQL(", ").join(
+            sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(c)) for c in all_columns[1:]
+        )
+
+        written = 0
+        for start in range(0, len(index), batch_size):
+            stop = min(start + batch_size, len(index))
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            meta = index.metadata.iloc[start:stop]
+            meta_values = [_copy_fields(meta[c], CATALOG_COLUMNS[c]) for c in columns]
+            for i, row in enumerate(range(start, stop)):
+                values = [index.song_ids[row]]
+                values.extend(m[i] for m in meta_values)
+                values.append(_vector_literal(index.matrix[row]))
+                writer.writerow(values)
+            buffer.seek(0)
+
+            def _copy(cur):
+                cur.execute(sql.SQL("CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP").format(stage, table))
+                cur.copy_expert(
+                    sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(stage, column_list).as_string(cur),
+                    buffer,
+                )
+                cur.execute(sql.SQL(
+                    "INSERT INTO {table} ({cols}) SELECT {cols} FROM {stage} "
+                    "ON CONFLICT (song_id) DO UPDATE SET {updates}"
+                ).format(table=table, cols=column_list, stage=stage, updates=updates))
+            self._run(_copy)
+            written += stop - start
+            logging.info(f"pgvector: loaded {written}/{len(index)} rows")
+        return written
+
+    def create_index(self, method: str = "hnsw", m: int = 16, ef_construction: int = 64, lists: int = None):
+        """Builds an HNSW (default) or IVFFlat cosine index on the vector column."""
+        table = sql.Identifier(self.table)
+        name = sql.Identifier(f"{self.table}_{VECTOR_COLUMN}_{method}")
+        if method == "hnsw":
+            options = sql.SQL("WITH (m = {}, ef_construction = {})").format(sql.Literal(m), sql.Literal(ef_construction))
+        elif method == "ivfflat":
+            if lists is None:
+                lists = max(1, int(np.sqrt(self.count())))
+            options = sql.SQL("WITH (lists = {})").format(sql.Literal(lists))
+        else:
+            raise ValueError(f"Unknown pgvector index method: {method}")
+
+        def _create(cur):
+            cur.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} USING {} ({} vector_cosine_ops) {}").format(
+                name, table, sql.SQL(method), sql.Identifier(VECTOR_COLUMN), options))
+            cur.execute(sql.SQL("ANALYZE {}").format(table))
+        self._run(_create)
+
+    def count(self) -> int:
+        def _count(cur):
+            cur.execute(sql.SQL("SELECT count(*) FROM {}").format(sql.Identifier(self.table)))
+            return cur.fetchone()[0]
+        return self._run(_count)
+
+    @staticmethod
+    def _filter_sql(filters: dict):
+        """
+        {column: value} prefilters: a scalar means equality, a list means
+        membership and a (low, high) tuple an inclusive range (either end
+        may be None).  Derived keys (`decade=1990`) expand to ranges on their
+        source column, as in AttributeFilter.
+        """
+        clauses, params = [], []
+        for col, value in (filters or {}).items():
+            value = tuple(_param(value)) if isinstance(value, tuple) else _param(value)
+            if col in DERIVED_RANGES:
+                source, width = DERIVED_RANGES[col]
+                ident = sql.Identifier(source)
+                if isinstance(value, tuple):
+                    low, high = value
+                    value = [(low, None if high is None else high + width - 1)]
+                else:
+                    value = [(v, v + width - 1) for v in (value if isinstance(value, list) else [value])]
+                terms = []
+                for low, high in value:
+                    bounds = []
+                    if low is not None:
+                        bounds.append(sql.SQL("{} >= %s").format(ident))
+                        params.append(low)
+                    if high is not None:
+                        bounds.append(sql.SQL("{} <= %s").format(ident))
+                        params.append(high)
+                    terms.append(sql.SQL("({})").format(sql.SQL(" AND ").join(bounds or [sql.SQL("TRUE")])))
+                clauses.append(sql.SQL("({})").format(sql.SQL(" OR ").join(terms)))
+                continue
+            if col not in CATALOG_COLUMNS:
+                raise ValueError(f"Cannot filter on unknown column: {col}")
+            ident = sql.Identifier(col)
+            if isinstance(value, tuple):
+                low, high = value
+                if low is not None:
+                    clauses.append(sql.SQL("{} >= %s").format(ident))
+                    params.append(low)
+                if high is not None:
+                    clauses.append(sql.SQL("{} <= %s").format(ident))
+                    params.append(high)
+            elif isinstance(value, (list, set)):
+                clauses.append(sql.SQL("{} = ANY(%s)").format(ident))
+                params.append(list(value))
+            else:
+                clauses.append(sql.SQL("{} = %s").format(ident))
+                params.append(value)
+        return clauses, params
+
+    def recommend(self, song_id, k: int = 5, threshold: float = None, filters: dict = None, ef_search: int = None) -> list:
+        """
+        Returns up to k (song_id, title, artist, genre, similarity) tuples
+        for songs closest to `song_id`, best first.
+        """
+        seed_id = str(_param(song_id))  # song_id is a TEXT column
+        table = sql.Identifier(self.table)
+        vector = sql.Identifier(VECTOR_COLUMN)
+        clauses, params = self._filter_sql(filters)
+        clauses.append(sql.SQL("song_id <> %s"))
+        where = sql.SQL(" AND ").join(clauses)
+
+        def _query(cur):
+            cur.execute(sql.SQL("SELECT {}::text FROM {} WHERE song_id = %s").format(vector, table), (seed_id,))
+            seed = cur.fetchone()
+            if seed is None or seed[0] is None:
+                return []
+            if ef_search is not None:
+                cur.execute("SET LOCAL hnsw.ef_search = %s", (int(ef_search),))
+            cur.execute(sql.SQL(
+                "SELECT song_id, title, artist, genre, 1 - ({vector} <=> %s::vector) AS similarity "
+                "FROM {table} WHERE {where} ORDER BY {vector} <=> %s::vector LIMIT %s"
+            ).format(vector=vector, table=table, where=where), [seed[0]] + params + [seed_id, seed[0], int(k)])
+            return cur.fetchall()
+
+        rows = self._run(_query)
+        if self.int_ids:
+            rows = [(int(r[0]),) + tuple(r[1:]) for r in rows]
+        if threshold is not None:
+            rows = [r for r in rows if r[4] >= threshold]
+        return rows
+
+    def close(self):
+        self.pool.closeall()
@@ -0,0 +1,27 @@
+# Submodules are imported on first attribute access, so `import src.index.feature_index`
+# (the NumPy-only query path) does not pull in pandas via the other index types.
+import importlib as _importlib
+
+_EXPORTS = {
+    "FeatureIndex": ".feature_index",
+    "NUMERICAL_FEATURES": ".feature_index",
+    "IVFIndex": ".ivf",
+    "QuantizedIndex": ".quantized",
+    "KNNGraph": ".knn_graph",
+    "build_knn_graph": ".knn_graph",
+    "IncrementalIndex": ".incremental",
+    "KernelSearcher": ".kernels",
+    "register_kernel": ".kernels",
+    "ShardedSearcher": ".sharded",
+    "AttributeFilter": ".attribute_filter",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(_importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
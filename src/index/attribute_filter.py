@@ -0,0 +1,115 @@
+# src/index/attribute_filter.py
+
+import numpy as np
+import pandas as pd
+
+from src.utils.catalog_lookup import _fold
+
+# Derived filter keys: name -> (source column, bucket width)
+DERIVED_RANGES = {
+    "decade": ("year", 10),
+}
+
+
+class AttributeFilter:
+    """
+    Precomputed catalog predicates for filtered recommendations.
+
+    String and boolean columns get one packed bitmap per distinct value;
+    numeric columns a sorted row order, so a range is two binary searches.
+    Each column is indexed on first use and kept, so building a filter for
+    a transient index only pays for the columns actually queried.
+
+    Filters use the same {column: value} form as PgVectorStore: a scalar
+    means equality, a list membership and a (low, high) tuple an inclusive
+    range with either end None.  `decade=1990` is shorthand for
+    year in [1990, 1999].
+    """
+
+    def __init__(self, metadata: pd.DataFrame):
+        self.metadata = metadata
+        self.n = len(metadata)
+        self._bitmaps = {}  # column -> {value: packed bitmap}
+        self._sorted = {}  # column -> (sorted values, row order)
+
+    def _value_bitmaps(self, column: str) -> dict:
+        if column not in self._bitmaps:
+            series = self.metadata[column]
+            if pd.api.types.is_bool_dtype(series.dtype):
+                keys = series.to_numpy(dtype=bool)
+            else:
+                keys = _fold(series)  # missing values fold to ""
+            codes, values = pd.factorize(keys)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.zeros(len(values) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(codes, minlength=len(values)), out=bounds[1:])
+            bitmaps = {}
+            for code, value in enumerate(values):
+                hit = np.zeros(self.n, dtype=bool)
+                hit[order[bounds[code]:bounds[code + 1]]] = True
+                bitmaps[value] = np.packbits(hit)
+            self._bitmaps[column] = bitmaps
+        return self._bitmaps[column]
+
+    def _sorted_index(self, column: str):
+        if column not in self._sorted:
+            values = self.metadata[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            order = np.argsort(values, kind="stable")  # NaN sorts last and never matches
+            self._sorted[column] = (values[order], order)
+        return self._sorted[column]
+
+    def _range(self, column: str, low, high) -> np.ndarray:
+        values, order = self._sorted_index(column)
+        start = 0 if low is None else np.searchsorted(values, low, side="left")
+        stop = np.searchsorted(values, np.inf if high is None else high, side="right")
+        hit = np.zeros(self.n, dtype=bool)
+        hit[order[start:stop]] = True
+        return np.packbits(hit)
+
+    def _is_numeric(self, column: str) -> bool:
+        dtype = self.metadata[column].dtype
+        return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+    def _term(self, column: str, value) -> np.ndarray:
+        if column in DERIVED_RANGES:
+            source, width = DERIVED_RANGES[column]
+            if source not in self.metadata.columns:
+                raise ValueError(f"Cannot filter on {column}: catalog has no {source} column")
+            if isinstance(value, tuple):
+                low, high = value
+                return self._term(source, (low, None if high is None else high + width - 1))
+            values = list(value) if isinstance(value, (list, set, np.ndarray)) else [value]
+            packed = np.zeros((self.n + 7) // 8, dtype=np.uint8)
+            for v in values:
+                packed |= self._range(source, v, v + width - 1)
+            return packed
+
+        if column not in self.metadata.columns:
+            raise ValueError(f"Cannot filter on unknown column: {column}")
+        if isinstance(value, tuple):
+            low, high = value
+            return self._range(column, low, high)
+
+        values = list(value) if isinstance(value, (list, set, np.ndarray)) else [value]
+        packed = np.zeros((self.n + 7) // 8, dtype=np.uint8)
+        if self._is_numeric(column):
+            for v in values:
+                packed |= self._range(column, v, v)
+            return packed
+        bitmaps = self._value_bitmaps(column)
+        for v in values:
+            key = bool(v) if isinstance(v, (bool, np.bool_)) else str(v).casefold()
+            hit = bitmaps.get(key)
+            if hit is not None:
+                packed |= hit
+        return packed
+
+    def mask(self, filters: dict):
+        """Boolean row mask for `filters` (all terms ANDed); None when there are none."""
+        if not filters:
+            return None
+        packed = None
+        for column, value in filters.items():
+            term = self._term(column, value)
+            packed = term if packed is None else packed & term
+        return np.unpackbits(packed, count=self.n).astype(bool)
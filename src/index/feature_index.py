@@ -0,0 +1,477 @@
+# src/index/feature_index.py
+
+import contextlib
+import hashlib
+import itertools
+
+import numpy as np
+
+from src.utils import metrics
+
+NUMERICAL_FEATURES = [
+    "tempo", "danceability", "energy", "valence", "loudness",
+    "acousticness", "instrumentalness", "liveness", "speechiness",
+]
+
+FORMAT_VERSION = 1
+
+# Below this fraction of matching rows, filtered searches score only the matches
+FILTER_GATHER_RATIO = 0.5
+
+# Rows normalised per step by from_compact_chunks
+STREAM_CHUNK_ROWS = 65536
+
+_BUILD_IDS = itertools.count(1)
+
+
+def next_build_id() -> int:
+    """Process-unique, increasing id stamped on approximate indexes (unlike id(), never reused)."""
+    return next(_BUILD_IDS)
+
+
+def _encode_strings(values):
+    """Packs a sequence of strings into (offsets, utf-8 blob) arrays."""
+    encoded = [str(v).encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return offsets, blob
+
+
+def _decode_strings(offsets, blob):
+    """Inverse of _encode_strings."""
+    text = blob.tobytes()
+    return np.array(
+        [text[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)],
+        dtype=object,
+    )
+
+
+def _concat_column(parts):
+    """Concatenates one metadata column across chunks, keeping it categorical when every chunk is."""
+    import pandas as pd
+
+    if all(isinstance(p.dtype, pd.CategoricalDtype) for p in parts):
+        return pd.api.types.union_categoricals(parts)
+    return pd.concat([pd.Series(p) for p in parts], ignore_index=True).to_numpy()
+
+
+def top_k(scores: np.ndarray, k: int, threshold: float = None):
+    """
+    Selects the k best columns of each row of `scores` without a full sort.
+
+    Returns (rows, sims), both shaped (n_queries, k).  Slots that are empty
+    (catalog smaller than k, or score below `threshold`) hold row -1 and NaN.
+    """
+    n_queries, n = scores.shape
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((n_queries, 0), dtype=np.int64), np.empty((n_queries, 0), dtype=np.float32)
+
+    if k < n:
+        part = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+    else:
+        part = np.broadcast_to(np.arange(n), (n_queries, n))
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    rows = np.take_along_axis(part, order, axis=1).astype(np.int64)
+    sims = np.take_along_axis(part_scores, order, axis=1).astype(np.float32)
+
+    invalid = ~np.isfinite(sims)
+    if threshold is not None:
+        invalid |= sims < threshold
+    rows[invalid] = -1
+    sims[invalid] = np.nan
+    return rows, sims
+
+
+def fit_scaler(values: np.ndarray):
+    """
+    Per-feature (mean, scale) as fitted by sklearn's StandardScaler: NaNs
+    ignored, population standard deviation, near-constant features scale 1.
+    """
+    # Column-major, so every caller's layout reduces each feature in the same order
+    values = np.asfortranarray(values, dtype=np.float64)
+    mean = np.nanmean(values, axis=0) if len(values) else np.zeros(values.shape[1])
+    scale = np.sqrt(np.nanvar(values, axis=0)) if len(values) else np.ones(values.shape[1])
+    scale[~(scale >= 10 * np.finfo(np.float64).eps)] = 1.0
+    return mean, scale
+
+
+def merge_top_k(parts, k: int, threshold: float = None):
+    """
+    Merges (rows, sims) results for disjoint row ranges (each padded with
+    -1 / NaN as returned by `top_k`) into one global top-k.
+    """
+    rows = np.concatenate([r for r, _ in parts], axis=1)
+    sims = np.concatenate([s for _, s in parts], axis=1)
+    best, _ = top_k(np.where(rows >= 0, sims, -np.inf), k, threshold)
+    picked = np.maximum(best, 0)
+    out_rows = np.where(best >= 0, np.take_along_axis(rows, picked, axis=1), -1)
+    out_sims = np.where(best >= 0, np.take_along_axis(sims, picked, axis=1), np.nan).astype(np.float32)
+    return out_rows, out_sims
+
+
+class FeatureIndex:
+    """
+    Precomputed cosine-similarity index over the scaled audio features.
+
+    Built once from FeatureEngineeringAgent output.  Holds the fitted scaler
+    statistics, an L2-normalised float32 feature matrix and a song_id -> row
+    map, so a query is a single dot product plus a top-k selection.
+
+    Loading and searching need only NumPy: metadata read by `load` stays a
+    dict of column arrays until `metadata` is first accessed.
+    """
+
+    def __init__(self, song_ids, matrix, mean, scale, feature_names, metadata=None, norms=None):
+        self.song_ids = np.asarray(song_ids)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.norms = None if norms is None else np.asarray(norms, dtype=np.float32)  # pre-normalisation row norms
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.feature_names = list(feature_names)
+        if metadata is None:
+            metadata = {"song_id": self.song_ids}
+        self._metadata = metadata  # DataFrame, or {column: array} until first use
+        self._row_of = {song_id: row for row, song_id in enumerate(self.song_ids.tolist())}
+        self._version = None
+        self._filter = None
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def metadata(self):
+        """Catalog columns as a DataFrame, row-aligned with the matrix."""
+        if isinstance(self._metadata, dict):
+            import pandas as pd
+            self._metadata = pd.DataFrame(self._metadata)
+        return self._metadata
+
+    @property
+    def version(self) -> str:
+        """Content hash of the song ids and matrix; changes whenever the catalog does."""
+        if self._version is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update("\0".join(map(str, self.song_ids.tolist())).encode("utf-8"))
+            digest.update(np.ascontiguousarray(self.matrix).data)
+            self._version = digest.hexdigest()
+        return self._version
+
+    @classmethod
+    def build(cls, song_features) -> "FeatureIndex":
+        """Fits the scaler on `song_features` and builds the normalised matrix."""
+        features = [f for f in NUMERICAL_FEATURES if f in song_features.columns]
+        if not features:
+            raise ValueError("No numerical audio features found to index.")
+
+        values = song_features[features].to_numpy(dtype=np.float64)
+        with metrics.span("index.fit_scaler"):
+            mean, scale = fit_scaler(values)
+
+        if "song_id" in song_features.columns:
+            song_ids = song_features["song_id"].to_numpy()
+        else:
+            song_ids = np.arange(len(song_features))
+
+        index = cls(song_ids, np.empty((0, len(features))), mean, scale, features, song_features)
+        index.matrix, index.norms = index.transform(values, return_norms=True)
+        return index
+
+    @classmethod
+    def from_compact(cls, compact) -> "FeatureIndex":
+        """
+        Builds the index from FeatureEngineeringAgent.get_compact_features
+        output, working on its float32 matrix directly.  Metadata is the
+        compact (categorical) metadata, without the raw feature columns.
+        """
+        if not compact.feature_names:
+            raise ValueError("No numerical audio features found to index.")
+
+        with metrics.span("index.fit_scaler"):
+            mean, scale = fit_scaler(compact.matrix)
+
+        if "song_id" in compact.metadata.columns:
+            song_ids = np.asarray(compact.metadata["song_id"])
+        else:
+            song_ids = np.arange(len(compact))
+
+        index = cls(song_ids, np.empty((0, len(compact.feature_names))), mean, scale, compact.feature_names, compact.metadata)
+        index.matrix, index.norms = index.transform(compact.matrix, return_norms=True)
+        return index
+
+    @classmethod
+    def from_compact_chunks(cls, chunks, chunk_rows: int = STREAM_CHUNK_ROWS) -> "FeatureIndex":
+        """
+        Builds the index from CompactFeatures chunks (see
+        FeatureEngineeringAgent.iter_compact_features), so the catalog never
+        has to exist as one DataFrame.
+
+        `chunks` is preferably a zero-argument callable returning a fresh
+        iterable of chunks: the source is then read twice, once for the
+        scaler statistics and once to fill the float32 matrix, and peak
+        memory is the finished index plus one chunk.  A plain iterable is
+        read once, but its raw rows are buffered (in the chunks' dtype) until
+        the scaler is fitted, an extra O(N) copy.  Two passes match
+        FeatureIndex.build up to float32 rounding; one pass over float64
+        chunks is identical to it.
+        """
+        if callable(chunks):
+            return cls._from_chunk_passes(chunks)
+        return cls._from_buffered_chunks(chunks, chunk_rows)
+
+    @staticmethod
+    def _check_features(compact, feature_names):
+        if feature_names is None:
+            if not compact.feature_names:
+                raise ValueError("No numerical audio features found to index.")
+        elif list(compact.feature_names) != feature_names:
+            raise ValueError(f"Chunk features {compact.feature_names} differ from {feature_names}.")
+        return list(compact.feature_names)
+
+    @staticmethod
+    def _chunk_metadata(metadata, n):
+        import pandas as pd
+
+        metadata = pd.DataFrame({
+            column: _concat_column([part[column] for part in metadata])
+            for column in metadata[0].columns
+        })
+        song_ids = metadata["song_id"].to_numpy() if "song_id" in metadata.columns else np.arange(n)
+        if np.issubdtype(song_ids.dtype, np.integer):
+            song_ids = song_ids.astype(np.int64)  # compaction downcasts; ids stay int64 as in build()
+        return metadata, song_ids
+
+    @classmethod
+    def _from_chunk_passes(cls, make_chunks) -> "FeatureIndex":
+        from .incremental import RunningStats
+
+        feature_names, stats, n = None, None, 0
+        with metrics.span("index.fit_scaler"):
+            for compact in make_chunks():
+                feature_names = cls._check_features(compact, feature_names)
+                if stats is None:
+                    stats = RunningStats(len(feature_names))
+                stats.partial_fit(compact.matrix)
+                n += len(compact)
+        if feature_names is None:
+            raise ValueError("No rows to index.")
+
+        scaler = cls(np.arange(0), np.empty((0, len(feature_names))), stats.mean, stats.scale, feature_names)
+        matrix = np.empty((n, len(feature_names)), dtype=np.float32)
+        norms = np.empty(n, dtype=np.float32)
+        metadata, start = [], 0
+        for compact in make_chunks():
+            cls._check_features(compact, feature_names)
+            stop = start + len(compact)
+            if stop > n:
+                raise ValueError("Chunk source yielded more rows on the second pass.")
+            matrix[start:stop], norms[start:stop] = scaler.transform(compact.matrix, return_norms=True)
+            metadata.append(compact.metadata)
+            start = stop
+        if start != n:
+            raise ValueError("Chunk source yielded fewer rows on the second pass.")
+
+        metadata, song_ids = cls._chunk_metadata(metadata, n)
+        return cls(song_ids, matrix, stats.mean, stats.scale, feature_names, metadata, norms)
+
+    @classmethod
+    def _from_buffered_chunks(cls, chunks, chunk_rows: int) -> "FeatureIndex":
+        feature_names, raw, metadata, n = None, None, [], 0
+        for compact in chunks:
+            feature_names = cls._check_features(compact, feature_names)
+            if raw is None:
+                raw = np.empty((max(len(compact), 1), len(feature_names)), dtype=compact.matrix.dtype)
+            if n + len(compact) > len(raw):
+                raw.resize((max(2 * len(raw), n + len(compact)), len(feature_names)), refcheck=False)
+            raw[n:n + len(compact)] = compact.matrix
+            metadata.append(compact.metadata)
+            n += len(compact)
+
+        if feature_names is None:
+            raise ValueError("No rows to index.")
+        raw.resize((n, len(feature_names)), refcheck=False)
+        metadata, song_ids = cls._chunk_metadata(metadata, n)
+
+        with metrics.span("index.fit_scaler"):
+            mean, scale = fit_scaler(raw)
+        index = cls(song_ids, np.empty((0, len(feature_names))), mean, scale, feature_names, metadata)
+        matrix = np.empty((n, len(feature_names)), dtype=np.float32)
+        norms = np.empty(n, dtype=np.float32)
+        for start in range(0, n, chunk_rows):
+            matrix[start:start + chunk_rows], norms[start:start + chunk_rows] = index.transform(raw[start:start + chunk_rows], return_norms=True)
+        index.matrix, index.norms = matrix, norms
+        return index
+
+    def transform(self, values: np.ndarray, return_norms: bool = False):
+        """
+        Scales raw feature vectors and L2-normalises them into query vectors.
+        float32 input is processed in float32 to avoid a float64 temporary.
+        With `return_norms`, also returns each row's norm before normalising.
+        """
+        values = np.atleast_2d(np.asarray(values))
+        dtype = np.float32 if values.dtype == np.float32 else np.float64
+        scaled = (values.astype(dtype, copy=False) - self.mean.astype(dtype)) / self.scale.astype(dtype)
+        np.nan_to_num(scaled, copy=False, nan=0.0)
+        norms = np.linalg.norm(scaled, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        scaled /= norms
+        scaled = np.ascontiguousarray(scaled, dtype=np.float32)
+        if return_norms:
+            return scaled, norms[:, 0].astype(np.float32)
+        return scaled
+
+    def scaled_vectors(self, rows) -> np.ndarray:
+        """
+        Standardised (not L2-normalised) feature vectors for `rows`, for
+        kernels that need magnitudes.  Indexes saved without row norms
+        recover them once from the raw feature columns in the metadata.
+        """
+        if self.norms is None:
+            missing = [f for f in self.feature_names if f not in self.metadata.columns]
+            if missing:
+                raise ValueError(f"Index has no row norms or raw feature columns {missing}; rebuild it.")
+            self.norms = self.transform(self.metadata[self.feature_names].to_numpy(dtype=np.float32), return_norms=True)[1]
+        return self.matrix[rows] * self.norms[rows, None]
+
+    def pinned(self):
+        """
+        Context manager under which row numbers stay valid.  A FeatureIndex
+        never renumbers rows, so this is a no-op (see IncrementalIndex.pinned).
+        """
+        return contextlib.nullcontext()
+
+    def row_of(self, song_id) -> int:
+        """Returns the matrix row for `song_id` (raises KeyError if unknown)."""
+        return self._row_of[song_id]
+
+    def rows_for(self, song_ids) -> np.ndarray:
+        """Vectorised row lookup; unknown ids map to -1."""
+        return np.fromiter((self._row_of.get(s, -1) for s in song_ids), dtype=np.int64)
+
+    def vectors(self, rows) -> np.ndarray:
+        """Normalised vectors for `rows`, ready to use as queries."""
+        return self.matrix[rows]
+
+    def ids(self, rows) -> np.ndarray:
+        return self.song_ids[rows]
+
+    def metadata_rows(self, rows):
+        return self.metadata.iloc[rows]
+
+    @property
+    def attribute_filter(self):
+        """Lazily built AttributeFilter over the metadata, see filter_mask."""
+        if self._filter is None:
+            from .attribute_filter import AttributeFilter
+            self._filter = AttributeFilter(self.metadata)
+        return self._filter
+
+    def filter_mask(self, filters: dict):
+        """Row mask for {column: value} filters (see AttributeFilter), or None."""
+        return self.attribute_filter.mask(filters)
+
+    def search(self, queries: np.ndarray, k: int, threshold: float = None, exclude=None, mask: np.ndarray = None):
+        """
+        Scores normalised `queries` against the whole catalog.
+
+        `exclude` optionally gives one row per query (or -1) to leave out,
+        typically the seed itself.  `mask` restricts results to rows where
+        it is True; selective masks only score the matching rows.  Returns
+        (rows, sims) as in `top_k`.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if exclude is not None:
+            exclude = np.asarray(exclude, dtype=np.int64).reshape(-1)
+
+        candidates = None
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            if len(candidates) >= FILTER_GATHER_RATIO * len(self):
+                candidates = None
+
+        with metrics.span("index.score"):
+            if candidates is None:
+                scores = queries @ self.matrix.T
+                if mask is not None:
+                    scores[:, ~mask] = -np.inf
+            else:
+                scores = queries @ self.matrix[candidates].T
+        if exclude is not None:
+            hit = exclude >= 0
+            if candidates is None:
+                scores[np.flatnonzero(hit), exclude[hit]] = -np.inf
+            else:
+                pos = np.searchsorted(candidates, exclude)
+                hit &= pos < len(candidates)
+                hit[hit] = candidates[pos[hit]] == exclude[hit]
+                scores[np.flatnonzero(hit), pos[hit]] = -np.inf
+
+        with metrics.span("index.top_k"):
+            rows, sims = top_k(scores, k, threshold)
+        if candidates is not None:
+            rows = np.where(rows >= 0, candidates[np.maximum(rows, 0)], -1)
+        return rows, sims
+
+    def save(self, path: str) -> None:
+        """Writes the index to a single .npz file."""
+        import pandas as pd
+
+        arrays = {
+            "format_version": np.array(FORMAT_VERSION),
+            "matrix": self.matrix,
+            "mean": self.mean,
+            "scale": self.scale,
+            "feature_names": np.array(self.feature_names, dtype=str),
+        }
+        if self.norms is not None:
+            arrays["norms"] = self.norms
+        ids_offsets, ids_blob = _encode_strings(self.song_ids)
+        arrays["song_ids_offsets"], arrays["song_ids_blob"] = ids_offsets, ids_blob
+        arrays["song_ids_numeric"] = np.array(np.issubdtype(self.song_ids.dtype, np.integer))
+
+        columns, kinds = [], []
+        for i, col in enumerate(self.metadata.columns):
+            series = self.metadata[col]
+            columns.append(str(col))
+            if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+                kinds.append("numeric")
+                arrays[f"meta_{i}"] = series.to_numpy()
+            else:
+                kinds.append("string")
+                offsets, blob = _encode_strings(series.astype(object).where(series.notna(), "").to_numpy())
+                arrays[f"meta_{i}_offsets"], arrays[f"meta_{i}_blob"] = offsets, blob
+        arrays["meta_columns"] = np.array(columns, dtype=str)
+        arrays["meta_kinds"] = np.array(kinds, dtype=str)
+
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "FeatureIndex":
+        """Loads an index previously written with `save`."""
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["format_version"]) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported feature index version: {int(data['format_version'])}")
+
+            song_ids = _decode_strings(data["song_ids_offsets"], data["song_ids_blob"])
+            if bool(data["song_ids_numeric"]):
+                song_ids = song_ids.astype(np.int64)
+
+            meta = {}
+            for i, (col, kind) in enumerate(zip(data["meta_columns"], data["meta_kinds"])):
+                if kind == "numeric":
+                    meta[str(col)] = data[f"meta_{i}"]
+                else:
+                    meta[str(col)] = _decode_strings(data[f"meta_{i}_offsets"], data[f"meta_{i}_blob"])
+
+            return cls(
+                song_ids,
+                data["matrix"],
+                data["mean"],
+                data["scale"],
+                [str(f) for f in data["feature_names"]],
+                meta,
+                data["norms"] if "norms" in data.files else None,
+            )
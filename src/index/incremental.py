@@ -0,0 +1,353 @@
+# src/index/incremental.py
+
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.utils import metrics
+from .attribute_filter import AttributeFilter
+from .feature_index import FeatureIndex, merge_top_k, top_k
+
+
+class RunningStats:
+    """
+    Per-feature running mean/variance that supports adding and removing
+    batches.  NaNs are skipped, so each feature keeps its own count.
+    """
+
+    def __init__(self, n_features: int):
+        self.count = np.zeros(n_features, dtype=np.int64)
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+
+    @staticmethod
+    def _batch(values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        count = (~np.isnan(values)).sum(axis=0)
+        mean = np.nansum(values, axis=0) / np.maximum(count, 1)
+        return count, mean, np.nansum((values - mean) ** 2, axis=0)
+
+    def partial_fit(self, values: np.ndarray):
+        if len(values) == 0:
+            return
+        n_b, mean_b, m2_b = self._batch(values)
+        n = self.count + n_b
+        delta = mean_b - self.mean
+        weight = n_b / np.maximum(n, 1)
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + m2_b + delta ** 2 * self.count * weight
+        self.count = n
+
+    def remove(self, values: np.ndarray):
+        if len(values) == 0:
+            return
+        n_b, mean_b, m2_b = self._batch(values)
+        n_a = self.count - n_b
+        empty = n_a <= 0
+        mean_a = np.where(empty, 0.0, (self.count * self.mean - n_b * mean_b) / np.maximum(n_a, 1))
+        delta = mean_b - mean_a
+        m2 = np.maximum(self.m2 - m2_b - delta ** 2 * n_a * n_b / np.maximum(self.count, 1), 0.0)
+        self.m2 = np.where(empty, 0.0, m2)
+        self.mean = mean_a
+        self.count = np.maximum(n_a, 0)
+
+    @property
+    def scale(self) -> np.ndarray:
+        """Population standard deviation, 1 for (near-)constant features (as fit_scaler)."""
+        scale = np.sqrt(self.m2 / np.maximum(self.count, 1))
+        scale[~(scale >= 10 * np.finfo(np.float64).eps)] = 1.0
+        return scale
+
+
+class IncrementalIndex:
+    """
+    A FeatureIndex that accepts adds, updates and deletes without a rebuild.
+
+    Changes go to a small delta segment that is searched alongside the main
+    matrix; replaced or deleted main rows are masked with tombstones.  The
+    scaler statistics are tracked as running mean/variance, and compaction
+    (in a background thread once the delta exceeds `compact_ratio` of the
+    main segment) rebuilds the main matrix with them.
+
+    Rows are numbered main first, then delta, and are only stable until the
+    next compaction.
+    """
+
+    def __init__(self, index: FeatureIndex, raw: np.ndarray, compact_ratio: float = 0.1, background: bool = True):
+        self.compact_ratio = compact_ratio
+        self.background = background
+        self._lock = threading.RLock()
+        self._compacting = False
+        self._journal = None
+        self._generation = 0
+        self._filter = None  # (generation, AttributeFilter)
+
+        self.stats = RunningStats(len(index.feature_names))
+        # NaNs are kept: the stats skip them as fit_scaler does, and transform scales them to 0
+        raw = np.asarray(raw, dtype=np.float32)
+        self.stats.partial_fit(raw)
+        self._install(index, raw)
+
+    @classmethod
+    def build(cls, song_features: pd.DataFrame, **kwargs) -> "IncrementalIndex":
+        return cls.from_index(FeatureIndex.build(song_features), **kwargs)
+
+    @classmethod
+    def from_index(cls, index: FeatureIndex, **kwargs) -> "IncrementalIndex":
+        """Wraps an index whose metadata still carries the raw feature columns."""
+        missing = [f for f in index.feature_names if f not in index.metadata.columns]
+        if missing:
+            raise ValueError(f"Index metadata lacks raw feature columns {missing}; build it with FeatureIndex.build.")
+        return cls(index, index.metadata[index.feature_names].to_numpy(dtype=np.float32), **kwargs)
+
+    def _install(self, index: FeatureIndex, raw: np.ndarray):
+        n_features = len(index.feature_names)
+        self.main = index
+        self._main_raw = raw
+        self._main_live = np.ones(len(index), dtype=bool)
+        self._delta_ids = []
+        self._delta_raw = np.empty((0, n_features), dtype=np.float32)
+        self._delta_matrix = np.empty((0, n_features), dtype=np.float32)
+        self._delta_meta = index.metadata.iloc[:0]
+        self._delta_live = np.empty(0, dtype=bool)
+        self._delta_row_of = {}
+        self._removed = set()  # ids whose main row is dead
+
+    # -- lookups ---------------------------------------------------------
+
+    @property
+    def feature_names(self) -> list:
+        return self.main.feature_names
+
+    @property
+    def version(self) -> str:
+        return f"{self.main.version}+{self._generation}"
+
+    def __len__(self) -> int:
+        return int(self._main_live.sum() + self._delta_live.sum())
+
+    def pinned(self):
+        """
+        Context manager that keeps row numbers stable: compaction cannot
+        install a renumbered main segment (nor mutations land) until it
+        exits.  Hold it across row_of/search/ids/metadata_rows calls whose
+        rows must agree.
+        """
+        return self._lock
+
+    def row_of(self, song_id) -> int:
+        with self._lock:
+            if song_id in self._delta_row_of:
+                return len(self.main) + self._delta_row_of[song_id]
+            if song_id in self._removed:
+                raise KeyError(song_id)
+            return self.main.row_of(song_id)
+
+    def rows_for(self, song_ids) -> np.ndarray:
+        rows = []
+        for song_id in song_ids:
+            try:
+                rows.append(self.row_of(song_id))
+            except KeyError:
+                rows.append(-1)
+        return np.asarray(rows, dtype=np.int64)
+
+    def _split(self, rows):
+        rows = np.asarray(rows)
+        return rows < len(self.main), rows - len(self.main)
+
+    def vectors(self, rows) -> np.ndarray:
+        with self._lock:
+            rows = np.asarray(rows)
+            if rows.ndim == 0:
+                return self.main.matrix[rows] if rows < len(self.main) else self._delta_matrix[rows - len(self.main)]
+            in_main, delta_rows = self._split(rows)
+            out = np.empty((len(rows), len(self.feature_names)), dtype=np.float32)
+            out[in_main] = self.main.matrix[rows[in_main]]
+            out[~in_main] = self._delta_matrix[delta_rows[~in_main]]
+            return out
+
+    def ids(self, rows) -> np.ndarray:
+        with self._lock:
+            rows = np.asarray(rows)
+            in_main, delta_rows = self._split(rows)
+            if in_main.all():
+                return self.main.song_ids[rows]
+            out = np.empty(len(rows), dtype=object)
+            out[in_main] = self.main.song_ids[rows[in_main]]
+            out[~in_main] = np.asarray(self._delta_ids, dtype=object)[delta_rows[~in_main]]
+            if np.issubdtype(self.main.song_ids.dtype, np.integer):
+                out = out.astype(np.int64)
+            return out
+
+    def metadata_rows(self, rows) -> pd.DataFrame:
+        with self._lock:
+            rows = np.asarray(rows)
+            in_main, delta_rows = self._split(rows)
+            parts = pd.concat([
+                self.main.metadata.iloc[rows[in_main]],
+                self._delta_meta.iloc[delta_rows[~in_main]],
+            ])
+            # restore the requested order
+            order = np.concatenate([np.flatnonzero(in_main), np.flatnonzero(~in_main)])
+            return parts.iloc[np.argsort(order, kind="stable")]
+
+    def filter_mask(self, filters: dict):
+        """Row mask (main + delta rows) for {column: value} filters, or None."""
+        if not filters:
+            return None
+        with self._lock:
+            if self._filter is None or self._filter[0] != self._generation:
+                metadata = pd.concat([self.main.metadata, self._delta_meta], ignore_index=True)
+                self._filter = (self._generation, AttributeFilter(metadata))
+            return self._filter[1].mask(filters)
+
+    def search(self, queries: np.ndarray, k: int, threshold: float = None, exclude=None, mask: np.ndarray = None):
+        """Same contract as FeatureIndex.search, over main + delta rows."""
+        with self._lock:
+            queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+            n_main = len(self.main)
+            with metrics.span("index.score"):
+                main_scores = queries @ self.main.matrix.T
+                delta_scores = queries @ self._delta_matrix.T
+            main_live, delta_live = self._main_live, self._delta_live
+            if mask is not None:
+                main_live, delta_live = main_live & mask[:n_main], delta_live & mask[n_main:]
+            main_scores[:, ~main_live] = -np.inf
+            delta_scores[:, ~delta_live] = -np.inf
+            if exclude is not None:
+                exclude = np.asarray(exclude, dtype=np.int64).reshape(-1)
+                for i, row in enumerate(exclude):
+                    if 0 <= row < n_main:
+                        main_scores[i, row] = -np.inf
+                    elif row >= n_main:
+                        delta_scores[i, row - n_main] = -np.inf
+
+            with metrics.span("index.top_k"):
+                main_rows, main_sims = top_k(main_scores, k, threshold)
+                delta_rows, delta_sims = top_k(delta_scores, k, threshold)
+                delta_rows = np.where(delta_rows >= 0, delta_rows + n_main, -1)
+                return merge_top_k([(main_rows, main_sims), (delta_rows, delta_sims)], k, threshold)
+
+    # -- mutations ---------------------------------------------------------
+
+    def _kill(self, song_id):
+        """Tombstones the live row of `song_id`; returns its raw features (or None)."""
+        if song_id in self._delta_row_of:
+            pos = self._delta_row_of.pop(song_id)
+            self._delta_live[pos] = False
+            return self._delta_raw[pos]
+        if song_id in self._removed:
+            return None
+        try:
+            row = self.main.row_of(song_id)
+        except KeyError:
+            return None
+        self._main_live[row] = False
+        self._removed.add(song_id)
+        return self._main_raw[row]
+
+    def _apply_upsert(self, song_features: pd.DataFrame, raw: np.ndarray, update_stats: bool):
+        ids = song_features["song_id"].tolist()
+        replaced = [r for r in (self._kill(song_id) for song_id in ids) if r is not None]
+        if update_stats:
+            self.stats.remove(np.asarray(replaced).reshape(-1, raw.shape[1]))
+            self.stats.partial_fit(raw)
+
+        start = len(self._delta_ids)
+        self._delta_ids.extend(ids)
+        self._delta_raw = np.vstack([self._delta_raw, raw])
+        self._delta_matrix = np.vstack([self._delta_matrix, self.main.transform(raw)])
+        self._delta_live = np.concatenate([self._delta_live, np.ones(len(ids), dtype=bool)])
+        meta = song_features.reindex(columns=self.main.metadata.columns)
+        self._delta_meta = pd.concat([self._delta_meta, meta], ignore_index=True) if len(self._delta_meta) else meta.reset_index(drop=True)
+        for offset, song_id in enumerate(ids):
+            self._delta_row_of[song_id] = start + offset
+
+    def _apply_delete(self, song_ids, update_stats: bool):
+        removed = [r for r in (self._kill(song_id) for song_id in song_ids) if r is not None]
+        if update_stats:
+            self.stats.remove(np.asarray(removed).reshape(-1, len(self.feature_names)))
+
+    def upsert(self, song_features: pd.DataFrame):
+        """Adds new tracks and replaces existing ones (matched on song_id)."""
+        if "song_id" not in song_features.columns:
+            raise ValueError("Incremental updates need a song_id column.")
+        song_features = song_features.drop_duplicates("song_id", keep="last")
+        raw = song_features[self.feature_names].to_numpy(dtype=np.float32, na_value=np.nan)
+        with self._lock:
+            self._apply_upsert(song_features, raw, update_stats=True)
+            self._generation += 1
+            if self._journal is not None:
+                self._journal.append(("upsert", song_features, raw))
+        self._maybe_compact()
+
+    add = upsert
+    update = upsert
+
+    def delete(self, song_ids):
+        """Removes tracks; unknown ids are ignored."""
+        song_ids = list(song_ids)
+        with self._lock:
+            self._apply_delete(song_ids, update_stats=True)
+            self._generation += 1
+            if self._journal is not None:
+                self._journal.append(("delete", song_ids, None))
+        self._maybe_compact()
+
+    # -- compaction --------------------------------------------------------
+
+    def needs_compaction(self) -> bool:
+        pending = len(self._delta_ids) + int((~self._main_live).sum())
+        return pending > self.compact_ratio * max(len(self.main), 1)
+
+    def _maybe_compact(self):
+        if self._compacting or not self.needs_compaction():
+            return
+        if self.background:
+            threading.Thread(target=self.compact, name="index-compaction", daemon=True).start()
+        else:
+            self.compact()
+
+    def compact(self):
+        """
+        Folds the delta segment and tombstones into a new main matrix scaled
+        with the running statistics.  Mutations made meanwhile are replayed
+        onto the new segment.
+        """
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+            self._journal = []
+            main_live = np.flatnonzero(self._main_live)
+            delta_live = np.flatnonzero(self._delta_live)
+            ids = np.concatenate([self.main.song_ids[main_live], np.asarray(self._delta_ids, dtype=object)[delta_live]])
+            raw = np.vstack([self._main_raw[main_live], self._delta_raw[delta_live]])
+            meta = pd.concat([self.main.metadata.iloc[main_live], self._delta_meta.iloc[delta_live]], ignore_index=True)
+            mean, scale = self.stats.mean.copy(), self.stats.scale
+            feature_names = self.feature_names
+
+        try:
+            with metrics.span("index.compact"):
+                if all(isinstance(i, (int, np.integer)) for i in ids[:1]):
+                    ids = ids.astype(np.int64)
+                index = FeatureIndex(ids, np.empty((0, len(feature_names))), mean, scale, feature_names, meta)
+                index.matrix, index.norms = index.transform(raw, return_norms=True)
+
+            with self._lock:
+                journal = self._journal
+                self._install(index, raw)
+                for op, payload, op_raw in journal:
+                    if op == "upsert":
+                        self._apply_upsert(payload, op_raw, update_stats=False)
+                    else:
+                        self._apply_delete(payload, update_stats=False)
+                self._generation += 1
+                logging.info(f"Compacted incremental index: {len(index)} main rows, {len(self._delta_ids)} replayed")
+        finally:
+            with self._lock:
+                self._journal = None
+                self._compacting = False
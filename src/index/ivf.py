@@ -0,0 +1,156 @@
+# src/index/ivf.py
+
+import time
+
+import numpy as np
+
+from .feature_index import FeatureIndex, next_build_id, top_k
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """Returns the nearest (highest cosine) centroid for each vector."""
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        labels[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+    return labels
+
+
+def _spherical_kmeans(vectors: np.ndarray, n_clusters: int, n_iter: int, rng: np.random.Generator) -> np.ndarray:
+    """Plain spherical k-means (centroids kept on the unit sphere)."""
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _assign(vectors, centroids)
+        sums = np.stack([
+            np.bincount(labels, weights=vectors[:, d], minlength=n_clusters)
+            for d in range(vectors.shape[1])
+        ], axis=1)
+        counts = np.bincount(labels, minlength=n_clusters)
+
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Approximate nearest-neighbour index (inverted file) over a FeatureIndex.
+
+    The catalog is partitioned with spherical k-means; a query scores only
+    the rows in its `n_probe` closest lists.  Raising `n_probe` trades speed
+    for recall, and `n_probe == n_lists` is equivalent to the exact search.
+    """
+
+    def __init__(self, index: FeatureIndex, centroids: np.ndarray, list_offsets: np.ndarray, list_rows: np.ndarray, n_probe: int = 8):
+        self.index = index
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.n_probe = n_probe
+        self.build_id = next_build_id()  # distinguishes this index in result-cache keys
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, index: FeatureIndex, n_lists: int = None, n_probe: int = 8, n_iter: int = 10, sample_size: int = None, seed: int = 0) -> "IVFIndex":
+        """
+        Trains the coarse centroids on a sample of the catalog and assigns
+        every row to its list.  Defaults to about sqrt(N) lists.
+        """
+        n = len(index)
+        if n == 0:
+            raise ValueError("Cannot build an IVF index over an empty catalog.")
+        if n_lists is None:
+            n_lists = int(np.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+        if sample_size is None:
+            sample_size = 64 * n_lists
+
+        rng = np.random.default_rng(seed)
+        sample = index.matrix
+        if sample_size < n:
+            sample = index.matrix[np.sort(rng.choice(n, sample_size, replace=False))]
+        centroids = _spherical_kmeans(sample, n_lists, n_iter, rng)
+
+        labels = _assign(index.matrix, centroids)
+        list_rows = np.argsort(labels, kind="stable")
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=list_offsets[1:])
+        return cls(index, centroids, list_offsets, list_rows, n_probe)
+
+    def search(self, queries: np.ndarray, k: int, threshold: float = None, exclude=None, mask: np.ndarray = None, n_probe: int = None):
+        """
+        Approximate counterpart of FeatureIndex.search with the same
+        arguments and (rows, sims) return shape.  `mask` is applied to the
+        probed lists, so very selective masks may return fewer than k rows.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        if exclude is None:
+            exclude = np.full(len(queries), -1, dtype=np.int64)
+        exclude = np.asarray(exclude, dtype=np.int64).reshape(-1)
+
+        centroid_scores = queries @ self.centroids.T
+        if n_probe < self.n_lists:
+            probes = np.argpartition(centroid_scores, self.n_lists - n_probe, axis=1)[:, self.n_lists - n_probe:]
+        else:
+            probes = np.broadcast_to(np.arange(self.n_lists), (len(queries), self.n_lists))
+
+        out_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        out_sims = np.full((len(queries), k), np.nan, dtype=np.float32)
+        for i, query in enumerate(queries):
+            candidates = np.concatenate([
+                self.list_rows[self.list_offsets[p]:self.list_offsets[p + 1]] for p in probes[i]
+            ])
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            if exclude[i] >= 0:
+                candidates = candidates[candidates != exclude[i]]
+            if len(candidates) == 0:
+                continue
+            scores = (self.index.matrix[candidates] @ query)[None, :]
+            rows, sims = top_k(scores, k, threshold)
+            found = rows[0] >= 0
+            out_rows[i, :found.sum()] = candidates[rows[0][found]]
+            out_sims[i, :found.sum()] = sims[0][found]
+        return out_rows, out_sims
+
+    def recall_at_k(self, k: int = 10, n_queries: int = 200, n_probe: int = None, seed: int = 0) -> dict:
+        """
+        Measures recall@k of this index against the exact FeatureIndex search
+        on a random sample of catalog rows used as seeds.
+        """
+        rng = np.random.default_rng(seed)
+        seeds = rng.choice(len(self.index), min(n_queries, len(self.index)), replace=False)
+        queries = self.index.matrix[seeds]
+
+        start = time.perf_counter()
+        exact_rows, _ = self.index.search(queries, k, exclude=seeds)
+        exact_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        approx_rows, _ = self.search(queries, k, exclude=seeds, n_probe=n_probe)
+        approx_s = time.perf_counter() - start
+
+        hits = 0
+        total = 0
+        for exact, approx in zip(exact_rows, approx_rows):
+            exact = exact[exact >= 0]
+            hits += len(np.intersect1d(exact, approx[approx >= 0]))
+            total += len(exact)
+
+        return {
+            "k": k,
+            "n_probe": min(n_probe or self.n_probe, self.n_lists),
+            "n_lists": self.n_lists,
+            "n_queries": len(seeds),
+            "recall": hits / total if total else 1.0,
+            "exact_ms_per_query": 1000 * exact_s / len(seeds),
+            "approx_ms_per_query": 1000 * approx_s / len(seeds),
+        }
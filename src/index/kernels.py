@@ -0,0 +1,144 @@
+# src/index/kernels.py
+"""
+Pluggable similarity kernels.
+
+A kernel maps a block of query vectors (q, d) and a block of catalog
+vectors (c, d) to a (q, c) score matrix, higher meaning more similar.
+Its `space` says which vectors the index feeds it: "normalised" (the
+L2-normalised matrix used by plain search) or "scaled" (standardised
+features with their magnitudes, see FeatureIndex.scaled_vectors).
+`kernel_search` evaluates any kernel over the catalog in row chunks with
+a running top-k, so memory stays bounded by `chunk_rows * q` scores.
+"""
+
+import inspect
+from typing import Callable
+
+import numpy as np
+
+from .feature_index import merge_top_k, top_k
+
+
+class Kernel:
+    def __init__(self, name: str, fn: Callable, space: str = "scaled"):
+        self.name = name
+        self.fn = fn
+        self.space = space
+
+
+KERNELS = {}
+
+
+def register_kernel(name: str, fn: Callable, space: str = "scaled") -> Kernel:
+    """Adds (or replaces) a kernel; `fn(queries, catalog, **params)` returns scores."""
+    if space not in ("normalised", "scaled"):
+        raise ValueError(f"Unknown kernel space: {space}")
+    KERNELS[name] = Kernel(name, fn, space)
+    return KERNELS[name]
+
+
+def get_kernel(name: str) -> Kernel:
+    try:
+        return KERNELS[name]
+    except KeyError:
+        raise ValueError(f"Unknown similarity kernel: {name} (available: {', '.join(sorted(KERNELS))})") from None
+
+
+def cosine(queries: np.ndarray, catalog: np.ndarray) -> np.ndarray:
+    """Cosine similarity; zero vectors score 0."""
+    q_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+    c_norms = np.linalg.norm(catalog, axis=1)
+    q_norms[q_norms == 0] = 1.0
+    c_norms[c_norms == 0] = 1.0
+    return (queries / q_norms) @ (catalog / c_norms[:, None]).T
+
+
+def normalised_dot(queries: np.ndarray, catalog: np.ndarray) -> np.ndarray:
+    """Cosine for vectors that are already L2-normalised."""
+    return queries @ catalog.T
+
+
+def euclidean_inverse(queries: np.ndarray, catalog: np.ndarray) -> np.ndarray:
+    """1 / (1 + Euclidean distance), from the expanded |q|^2 + |c|^2 - 2 q.c form."""
+    sq = (queries * queries).sum(axis=1)[:, None] + (catalog * catalog).sum(axis=1)[None, :] - 2.0 * (queries @ catalog.T)
+    return 1.0 / (1.0 + np.sqrt(np.maximum(sq, 0.0)))
+
+
+def weighted_cosine(queries: np.ndarray, catalog: np.ndarray, weights=None) -> np.ndarray:
+    """Cosine after scaling each feature by `weights` (a per-feature array)."""
+    if weights is None:
+        return cosine(queries, catalog)
+    weights = np.asarray(weights, dtype=queries.dtype)
+    return cosine(queries * weights, catalog * weights)
+
+
+register_kernel("cosine", normalised_dot, space="normalised")
+register_kernel("euclidean_inverse", euclidean_inverse)
+register_kernel("weighted_cosine", weighted_cosine)
+
+
+def kernel_search(kernel, queries: np.ndarray, catalog, k: int, threshold: float = None, exclude=None, mask: np.ndarray = None, chunk_rows: int = 65536, **params):
+    """
+    Top-k catalog rows for each query under `kernel` (a name or Kernel).
+
+    `catalog` is anything with len() and row slicing that yields vectors in
+    the kernel's space (an array, or a KernelSearcher).
+    `exclude` and `mask` work as in FeatureIndex.search; extra keyword
+    arguments go to the kernel.  Returns (rows, sims) as in `top_k`.
+    """
+    kernel = get_kernel(kernel) if isinstance(kernel, str) else kernel
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    if exclude is not None:
+        exclude = np.asarray(exclude, dtype=np.int64).reshape(-1)
+
+    parts = []
+    for start in range(0, len(catalog), chunk_rows):
+        stop = min(start + chunk_rows, len(catalog))
+        scores = np.asarray(kernel.fn(queries, np.asarray(catalog[start:stop], dtype=np.float32), **params), dtype=np.float32)
+        if mask is not None:
+            scores[:, ~mask[start:stop]] = -np.inf
+        if exclude is not None:
+            hit = (exclude >= start) & (exclude < stop)
+            scores[np.flatnonzero(hit), exclude[hit] - start] = -np.inf
+        rows, sims = top_k(scores, k, threshold)
+        parts.append((np.where(rows >= 0, rows + start, -1), sims))
+    if not parts:
+        return top_k(np.empty((len(queries), 0), dtype=np.float32), k)
+    return merge_top_k(parts, k, threshold)
+
+
+class KernelSearcher:
+    """
+    Exact search over a FeatureIndex under any registered kernel, with the
+    FeatureIndex.search contract.  Queries must be in the kernel's space:
+    use `vectors(rows)` for catalog seeds.  A `weights` parameter may be a
+    {feature: weight} dict (missing features weigh 1).
+    """
+
+    def __init__(self, index, kernel, chunk_rows: int = 65536, **params):
+        self.index = index
+        self.kernel = get_kernel(kernel) if isinstance(kernel, str) else kernel
+        self.chunk_rows = chunk_rows
+        try:
+            inspect.signature(self.kernel.fn).bind(None, None, **params)
+        except TypeError as e:
+            raise ValueError(f"Bad parameters for kernel {self.kernel.name}: {e}") from None
+        if isinstance(params.get("weights"), dict):
+            weights = params["weights"]
+            params["weights"] = np.array([weights.get(f, 1.0) for f in index.feature_names], dtype=np.float32)
+        self.params = params
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, rows):
+        # Catalog rows in the kernel's space, read chunk by chunk by kernel_search
+        return self.vectors(rows)
+
+    def vectors(self, rows) -> np.ndarray:
+        if self.kernel.space == "normalised":
+            return self.index.vectors(rows)
+        return self.index.scaled_vectors(rows)
+
+    def search(self, queries: np.ndarray, k: int, threshold: float = None, exclude=None, mask: np.ndarray = None):
+        return kernel_search(self.kernel, queries, self, k, threshold, exclude, mask, self.chunk_rows, **self.params)
@@ -0,0 +1,188 @@
+# src/index/knn_graph.py
+"""
+Offline all-pairs top-k neighbour graph.
+
+Every track's k nearest neighbours (same scaled-cosine semantics as
+RecommendationAgent) are computed in row blocks x column blocks, so peak
+memory is bounded by `block_rows * block_cols` scores whatever the catalog
+size.  Results go to memory-mapped .npy files in `out_dir` and progress is
+checkpointed after each row block, so an interrupted job resumes where it
+stopped.
+
+    python -m src.index.knn_graph data/feature_index.npz data/knn_graph --k 20
+"""
+
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+
+from .feature_index import FeatureIndex, _decode_strings, _encode_strings, top_k
+
+META_FILE = "meta.json"
+
+
+def _write_meta(out_dir: str, meta: dict):
+    tmp_path = os.path.join(out_dir, META_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(out_dir, META_FILE))
+
+
+def _read_meta(out_dir: str):
+    try:
+        with open(os.path.join(out_dir, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _block_top_k(index: FeatureIndex, start: int, stop: int, k: int, block_cols: int):
+    """Exact top-k (excluding self) for rows [start, stop) against the whole catalog."""
+    queries = index.matrix[start:stop]
+    best_rows = np.full((len(queries), 0), -1, dtype=np.int64)
+    best_sims = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    own_rows = np.arange(start, stop)
+
+    for col_start in range(0, len(index), block_cols):
+        col_stop = min(col_start + block_cols, len(index))
+        scores = queries @ index.matrix[col_start:col_stop].T
+        overlap = (own_rows >= col_start) & (own_rows < col_stop)
+        scores[np.flatnonzero(overlap), own_rows[overlap] - col_start] = -np.inf
+
+        # Merge this column block with the running best k
+        rows, sims = top_k(scores, k)
+        rows = np.where(rows >= 0, rows + col_start, -1)
+        sims = np.where(rows >= 0, sims, -np.inf).astype(np.float32)
+        merged_rows = np.concatenate([best_rows, rows], axis=1)
+        merged_sims = np.concatenate([best_sims, sims], axis=1)
+        keep, _ = top_k(merged_sims, k)
+        best_rows = np.take_along_axis(merged_rows, np.maximum(keep, 0), axis=1)
+        best_sims = np.take_along_axis(merged_sims, np.maximum(keep, 0), axis=1)
+        best_rows[keep < 0] = -1
+        best_sims[keep < 0] = -np.inf
+
+    return best_rows, best_sims
+
+
+def build_knn_graph(index: FeatureIndex, out_dir: str, k: int = 20, block_rows: int = 1024, block_cols: int = 65536, resume: bool = True) -> "KNNGraph":
+    """
+    Computes the top-k neighbour graph of `index` into `out_dir`, resuming a
+    previous run for the same index version when `resume` is set.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    n = len(index)
+    k = min(k, max(n - 1, 0))
+    neighbours_path = os.path.join(out_dir, "neighbours.npy")
+    scores_path = os.path.join(out_dir, "scores.npy")
+
+    meta = _read_meta(out_dir) if resume else None
+    if not (meta and meta["index_version"] == index.version and meta["k"] == k and meta["n"] == n
+            and os.path.exists(neighbours_path) and os.path.exists(scores_path)):
+        meta = {"index_version": index.version, "n": n, "k": k, "block_rows": block_rows, "next_row": 0}
+        neighbours = np.lib.format.open_memmap(neighbours_path, mode="w+", dtype=np.int32, shape=(n, k))
+        scores = np.lib.format.open_memmap(scores_path, mode="w+", dtype=np.float32, shape=(n, k))
+        ids_offsets, ids_blob = _encode_strings(index.song_ids)
+        np.save(os.path.join(out_dir, "song_ids_offsets.npy"), ids_offsets)
+        np.save(os.path.join(out_dir, "song_ids_blob.npy"), ids_blob)
+        meta["song_ids_numeric"] = bool(np.issubdtype(index.song_ids.dtype, np.integer))
+        _write_meta(out_dir, meta)
+    else:
+        neighbours = np.lib.format.open_memmap(neighbours_path, mode="r+")
+        scores = np.lib.format.open_memmap(scores_path, mode="r+")
+        logging.info(f"knn graph: resuming at row {meta['next_row']}/{n}")
+
+    for start in range(meta["next_row"], n, block_rows):
+        stop = min(start + block_rows, n)
+        rows, sims = _block_top_k(index, start, stop, k, block_cols)
+        neighbours[start:stop] = rows
+        scores[start:stop] = np.where(rows >= 0, sims, np.nan)
+        neighbours.flush()
+        scores.flush()
+        meta["next_row"] = stop
+        _write_meta(out_dir, meta)
+        logging.info(f"knn graph: {stop}/{n} rows")
+
+    del neighbours, scores
+    return KNNGraph.load(out_dir)
+
+
+class KNNGraph:
+    """
+    Precomputed neighbour lists, memory-mapped from `build_knn_graph`
+    output.  Row i holds the k best neighbours of catalog row i, best first
+    (-1 / NaN pad when the catalog is smaller than k + 1).
+    """
+
+    def __init__(self, neighbours: np.ndarray, scores: np.ndarray, song_ids: np.ndarray, index_version: str = None):
+        self.neighbours = neighbours
+        self.scores = scores
+        self.song_ids = song_ids
+        self.index_version = index_version
+        self._row_of = {song_id: row for row, song_id in enumerate(song_ids.tolist())}
+
+    @property
+    def k(self) -> int:
+        return self.neighbours.shape[1]
+
+    def __len__(self) -> int:
+        return self.neighbours.shape[0]
+
+    @classmethod
+    def load(cls, out_dir: str, mmap: bool = True) -> "KNNGraph":
+        meta = _read_meta(out_dir)
+        if meta is None:
+            raise FileNotFoundError(f"No knn graph found in {out_dir}")
+        if meta["next_row"] < meta["n"]:
+            raise ValueError(f"knn graph in {out_dir} is incomplete ({meta['next_row']}/{meta['n']} rows); rerun build_knn_graph to resume.")
+        mode = "r" if mmap else None
+        song_ids = _decode_strings(
+            np.load(os.path.join(out_dir, "song_ids_offsets.npy")),
+            np.load(os.path.join(out_dir, "song_ids_blob.npy")),
+        )
+        if meta.get("song_ids_numeric"):
+            song_ids = song_ids.astype(np.int64)
+        return cls(
+            np.load(os.path.join(out_dir, "neighbours.npy"), mmap_mode=mode),
+            np.load(os.path.join(out_dir, "scores.npy"), mmap_mode=mode),
+            song_ids,
+            meta["index_version"],
+        )
+
+    def row_of(self, song_id) -> int:
+        return self._row_of[song_id]
+
+    def neighbours_of(self, song_id, k: int = None, threshold: float = None):
+        """
+        O(1) lookup of a seed's neighbours as (rows, song_ids, similarities).
+        Raises KeyError for unknown seeds.
+        """
+        row = self._row_of[song_id]
+        rows = np.asarray(self.neighbours[row, :k])
+        sims = np.asarray(self.scores[row, :k])
+        keep = rows >= 0
+        if threshold is not None:
+            keep &= sims >= threshold
+        rows, sims = rows[keep], sims[keep]
+        return rows, self.song_ids[rows], sims
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the offline top-k neighbour graph for a saved FeatureIndex.")
+    parser.add_argument("index_path")
+    parser.add_argument("out_dir")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--block-rows", type=int, default=1024)
+    parser.add_argument("--block-cols", type=int, default=65536)
+    parser.add_argument("--no-resume", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index = FeatureIndex.load(args.index_path)
+    build_knn_graph(index, args.out_dir, args.k, args.block_rows, args.block_cols, resume=not args.no_resume)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# src/index/quantized.py
+
+import json
+import os
+import time
+
+import numpy as np
+
+from src.utils import metrics
+from .feature_index import FeatureIndex, merge_top_k, next_build_id, top_k
+
+META_FILE = "quantized.json"
+
+
+class QuantizedIndex:
+    """
+    int8 scalar-quantized copy of a FeatureIndex matrix with exact re-ranking.
+
+    Each dimension of the normalised matrix is stored as int8 with its own
+    scale (4x smaller than float32, 8x smaller than float64).  A query
+    scores the int8 codes chunk by chunk, keeps the `rerank_factor * k`
+    best candidates and re-scores only those against the exact vectors.
+    `build` re-ranks against the FeatureIndex matrix itself, so it adds the
+    codes on top of that matrix.  The saving needs the exact vectors on
+    disk: `load` memory-maps them (and RecommendationAgent.load_ann_index
+    serves the feature index from the same mapping), so co-hosted replicas
+    share the page cache and only touch re-ranked rows.
+    Same `search` contract as FeatureIndex.search.
+    """
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray, exact: np.ndarray, rerank_factor: int = 4, chunk_rows: int = 65536, index_version: str = None):
+        self.codes = codes
+        self.scales = np.asarray(scales, dtype=np.float32)
+        self.exact = exact
+        self.rerank_factor = rerank_factor
+        self.chunk_rows = chunk_rows
+        self.index_version = index_version
+        self.build_id = next_build_id()  # distinguishes this index in result-cache keys
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    @classmethod
+    def build(cls, index: FeatureIndex, rerank_factor: int = 4, chunk_rows: int = 65536) -> "QuantizedIndex":
+        """Quantizes `index.matrix` symmetrically per dimension."""
+        matrix = index.matrix
+        scales = np.abs(matrix).max(axis=0) / 127.0 if len(matrix) else np.ones(matrix.shape[1])
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        codes = np.empty(matrix.shape, dtype=np.int8)
+        for start in range(0, len(matrix), chunk_rows):
+            block = matrix[start:start + chunk_rows] / scales
+            codes[start:start + chunk_rows] = np.clip(np.rint(block), -127, 127)
+        return cls(codes, scales, matrix, rerank_factor, chunk_rows, index.version)
+
+    def memory_report(self) -> dict:
+        """
+        Resident bytes of this index against full-precision matrices: the
+        int8 codes and scales, plus the exact vectors unless they are
+        memory-mapped (mapped pages are page cache, shared and evictable).
+        """
+        n, d = self.codes.shape
+        quantized = self.codes.nbytes + self.scales.nbytes
+        exact_mapped = isinstance(self.exact, np.memmap)
+        exact_resident = 0 if exact_mapped else np.asarray(self.exact).nbytes
+        resident = quantized + exact_resident
+        return {
+            "quantized_bytes": quantized,
+            "exact_resident_bytes": exact_resident,
+            "resident_bytes": resident,
+            "float32_bytes": n * d * 4,
+            "float64_bytes": n * d * 8,
+            "saving_vs_float32": 1 - resident / max(n * d * 4, 1),
+            "saving_vs_float64": 1 - resident / max(n * d * 8, 1),
+            "exact_memory_mapped": exact_mapped,
+        }
+
+    def _candidates(self, queries: np.ndarray, n_candidates: int, exclude: np.ndarray, mask: np.ndarray):
+        """Approximate top-n_candidates rows per query from the int8 codes."""
+        scaled = queries * self.scales
+        parts = []
+        for start in range(0, len(self), self.chunk_rows):
+            stop = min(start + self.chunk_rows, len(self))
+            scores = scaled @ self.codes[start:stop].T.astype(np.float32)
+            if mask is not None:
+                scores[:, ~mask[start:stop]] = -np.inf
+            if exclude is not None:
+                hit = (exclude >= start) & (exclude < stop)
+                scores[np.flatnonzero(hit), exclude[hit] - start] = -np.inf
+            rows, sims = top_k(scores, n_candidates)
+            parts.append((np.where(rows >= 0, rows + start, -1), sims))
+        return merge_top_k(parts, n_candidates)[0] if parts else np.empty((len(queries), 0), dtype=np.int64)
+
+    def search(self, queries: np.ndarray, k: int, threshold: float = None, exclude=None, mask: np.ndarray = None, rerank_factor: int = None):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if exclude is not None:
+            exclude = np.asarray(exclude, dtype=np.int64).reshape(-1)
+        n_candidates = max(k, k * (rerank_factor or self.rerank_factor))
+
+        with metrics.span("index.quantized_scan"):
+            candidates = self._candidates(queries, n_candidates, exclude, mask)
+        with metrics.span("index.rerank"):
+            valid = candidates >= 0
+            # Fetch each candidate row once (sorted, which suits a memory-mapped file)
+            unique_rows, inverse = np.unique(np.where(valid, candidates, 0), return_inverse=True)
+            vectors = np.asarray(self.exact[unique_rows])[inverse.reshape(candidates.shape)]
+            exact_scores = np.einsum("qcd,qd->qc", vectors, queries)
+            exact_scores[~valid] = -np.inf
+            best, sims = top_k(exact_scores, k, threshold)
+        rows = np.where(best >= 0, np.take_along_axis(candidates, np.maximum(best, 0), axis=1), -1)
+        return rows, sims
+
+    def recall_at_k(self, index: FeatureIndex, k: int = 10, n_queries: int = 200, rerank_factor: int = None, seed: int = 0) -> dict:
+        """
+        Recall@k against exact FeatureIndex search on random catalog seeds,
+        with timings and the memory report.
+        """
+        rng = np.random.default_rng(seed)
+        seeds = rng.choice(len(index), min(n_queries, len(index)), replace=False)
+        queries = index.matrix[seeds]
+
+        start = time.perf_counter()
+        exact_rows, _ = index.search(queries, k, exclude=seeds)
+        exact_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        approx_rows, _ = self.search(queries, k, exclude=seeds, rerank_factor=rerank_factor)
+        approx_s = time.perf_counter() - start
+
+        hits = total = 0
+        for exact, approx in zip(exact_rows, approx_rows):
+            exact = exact[exact >= 0]
+            hits += len(np.intersect1d(exact, approx[approx >= 0]))
+            total += len(exact)
+
+        return dict(
+            {
+                "k": k,
+                "rerank_factor": rerank_factor or self.rerank_factor,
+                "n_queries": len(seeds),
+                "recall": hits / total if total else 1.0,
+                "exact_ms_per_query": 1000 * exact_s / len(seeds),
+                "quantized_ms_per_query": 1000 * approx_s / len(seeds),
+            },
+            **self.memory_report(),
+        )
+
+    def save(self, out_dir: str):
+        """Writes codes, scales and the exact float32 vectors as .npy files."""
+        os.makedirs(out_dir, exist_ok=True)
+        np.save(os.path.join(out_dir, "codes.npy"), self.codes)
+        np.save(os.path.join(out_dir, "scales.npy"), self.scales)
+        np.save(os.path.join(out_dir, "vectors.npy"), np.asarray(self.exact, dtype=np.float32))
+        with open(os.path.join(out_dir, META_FILE), "w") as f:
+            json.dump({"index_version": self.index_version, "rerank_factor": self.rerank_factor, "chunk_rows": self.chunk_rows}, f)
+
+    @classmethod
+    def load(cls, out_dir: str, mmap_exact: bool = True) -> "QuantizedIndex":
+        """Loads codes into memory; exact vectors are memory-mapped unless `mmap_exact` is False."""
+        with open(os.path.join(out_dir, META_FILE)) as f:
+            meta = json.load(f)
+        return cls(
+            np.load(os.path.join(out_dir, "codes.npy")),
+            np.load(os.path.join(out_dir, "scales.npy")),
+            np.load(os.path.join(out_dir, "vectors.npy"), mmap_mode="r" if mmap_exact else None),
+            meta["rerank_factor"],
+            meta["chunk_rows"],
+            meta["index_version"],
+        )
@@ -0,0 +1,104 @@
+# src/index/sharded.py
+
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src.utils import metrics
+from .feature_index import FeatureIndex, merge_top_k, top_k
+
+# Per-worker view of the shared matrix, set up by _attach
+_worker_shm = None
+_worker_matrix = None
+
+
+def _attach(shm_name: str, shape: tuple):
+    global _worker_shm, _worker_matrix
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_matrix = np.ndarray(shape, dtype=np.float32, buffer=_worker_shm.buf)
+
+
+def _shard_top_k(start: int, stop: int, queries: np.ndarray, k: int, threshold: float, exclude: np.ndarray):
+    """Local top-k of `queries` over matrix rows [start, stop), in global row numbers."""
+    scores = queries @ _worker_matrix[start:stop].T
+    if exclude is not None:
+        hit = (exclude >= start) & (exclude < stop)
+        scores[np.flatnonzero(hit), exclude[hit] - start] = -np.inf
+    rows, sims = top_k(scores, k, threshold)
+    return np.where(rows >= 0, rows + start, -1), sims
+
+
+def _release(executor: ProcessPoolExecutor, shm: shared_memory.SharedMemory):
+    executor.shutdown(wait=True, cancel_futures=True)
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class ShardedSearcher:
+    """
+    Exact search over a FeatureIndex split across a persistent process pool.
+
+    The normalised matrix is copied once into a shared-memory block that
+    every worker maps without pickling; each worker owns a contiguous row
+    shard, returns its local top-k and the shards are merged here.  Only
+    the queries and the (n_queries, k) results cross process boundaries.
+    Same `search` contract as FeatureIndex.search.
+
+    The pool lives until `close()` (or interpreter exit); build a new
+    searcher when the index changes.
+    """
+
+    def __init__(self, index: FeatureIndex, n_workers: int = None, n_shards: int = None):
+        self.index = index
+        self.version = index.version
+        self.n_workers = n_workers or os.cpu_count() or 1
+        n_shards = n_shards or self.n_workers
+        bounds = np.linspace(0, len(index), min(n_shards, max(len(index), 1)) + 1).astype(np.int64)
+        self.shards = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+        matrix = index.matrix
+        self._shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+        np.ndarray(matrix.shape, dtype=np.float32, buffer=self._shm.buf)[:] = matrix
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            initializer=_attach,
+            initargs=(self._shm.name, matrix.shape),
+        )
+        self._finalizer = weakref.finalize(self, _release, self._executor, self._shm)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def search(self, queries: np.ndarray, k: int, threshold: float = None, exclude=None, mask: np.ndarray = None):
+        if mask is not None:
+            # Filtered searches only score the matching rows, cheaper in-process
+            return self.index.search(queries, k, threshold, exclude, mask)
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if exclude is not None:
+            exclude = np.asarray(exclude, dtype=np.int64).reshape(-1)
+        with metrics.span("index.sharded_search"):
+            futures = [
+                self._executor.submit(_shard_top_k, start, stop, queries, k, threshold, exclude)
+                for start, stop in self.shards
+            ]
+            parts = [f.result() for f in futures]
+        if not parts:
+            return top_k(np.empty((len(queries), 0), dtype=np.float32), k)
+        with metrics.span("index.merge_top_k"):
+            return merge_top_k(parts, k, threshold)
+
+    def close(self):
+        """Shuts the pool down and frees the shared matrix."""
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,18 @@
+# Imported on first attribute access, so `python -m src.service.recommendation_service`
+# does not load the module twice.
+import importlib as _importlib
+
+_EXPORTS = {
+    "MicroBatcher": ".recommendation_service",
+    "RecommendationService": ".recommendation_service",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(_importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
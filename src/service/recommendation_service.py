@@ -0,0 +1,422 @@
+# src/service/recommendation_service.py
+"""
+Standalone HTTP/JSON recommendation service with micro-batching.
+
+    python -m src.service.recommendation_service --index data/feature_index.npz --port 8080
+
+    POST /recommend  {"song_id": "...", "k": 5, "threshold": 0.0, "filters": {...},
+                      "kernel": "cosine", "kernel_params": {...}, "approximate": false}
+    GET  /health     catalog size, index version and queue depth
+    GET  /stats      batching counters
+
+Concurrent requests are collected for up to `max_wait_ms` (or until
+`max_batch` are waiting) and requests with the same options are scored
+together through RecommendationAgent.recommend_batch, i.e. one matrix
+multiply for the whole group.  Scoring runs on a single worker thread, so
+requests arriving while a batch is being scored form the next, larger
+batch.  The queue is bounded: when it is full requests are rejected with
+503 straight away instead of queueing without limit, and a request that
+waits longer than `timeout` gets a 504.  JSON has no tuples, so range
+filters are written as {"range": [low, high]}.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from src.agents.recommendation_agent import RecommendationAgent
+from src.index.feature_index import FeatureIndex
+from src.utils import metrics
+from src.utils.result_cache import freeze, freeze_params
+
+logger = logging.getLogger(__name__)
+
+RESULT_COLUMNS = ["title", "artist", "genre"]
+MAX_BODY_BYTES = 1 << 20
+MAX_K = 100
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+class ServiceError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Overloaded(ServiceError):
+    def __init__(self):
+        super().__init__(503, "Too many pending requests, retry later.")
+
+
+class _Pending:
+    __slots__ = ("song_id", "k", "options", "key", "future")
+
+    def __init__(self, song_id, k: int, options: tuple, future: asyncio.Future):
+        self.song_id = song_id
+        self.k = k
+        self.options = options  # (threshold, approximate, filters, kernel, kernel_params)
+        threshold, approximate, filters, kernel, kernel_params = options
+        # Requests with equal keys are scored together
+        self.key = (threshold, approximate, freeze(filters), kernel, freeze_params(kernel_params))
+        self.future = future
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_scalar(value) -> bool:
+    return value is None or isinstance(value, (str, int, float))
+
+
+def _filters_from_json(filters: dict):
+    """
+    {"year": {"range": [1990, 1999]}} -> {"year": (1990, 1999)}; scalars and
+    lists of scalars pass through.  Range ends are numbers or null (open).
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ServiceError(400, "filters must be an object")
+    out = {}
+    for column, value in filters.items():
+        if isinstance(value, dict):
+            bounds = value.get("range")
+            if (set(value) != {"range"} or not isinstance(bounds, list) or len(bounds) != 2
+                    or not all(b is None or _is_number(b) for b in bounds)):
+                raise ServiceError(400, f"Bad filter for {column}: use a value, a list or {{\"range\": [low, high]}}")
+            value = tuple(bounds)
+        elif not (_is_scalar(value) or (isinstance(value, list) and all(_is_scalar(v) for v in value))):
+            raise ServiceError(400, f"Bad filter for {column}: use a value, a list or {{\"range\": [low, high]}}")
+        out[column] = value
+    return out
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Not JSON serialisable: {type(value).__name__}")
+
+
+class MicroBatcher:
+    """
+    Collects recommendation requests from the event loop and scores them in
+    batches on a worker thread.  `submit` raises Overloaded when the queue
+    is full and asyncio.TimeoutError when the answer takes longer than
+    `timeout` seconds.
+    """
+
+    def __init__(self, agent: RecommendationAgent, max_batch: int = 256, max_wait_ms: float = 2.0, max_queue: int = 4096, timeout: float = 1.0):
+        self.agent = agent
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.counters = {'requests': 0, 'batches': 0, 'batched_requests': 0, 'rejected': 0, 'timeouts': 0, 'expired': 0}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recommend-batch")
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, song_id, k: int = 5, threshold: float = 0.0, approximate: bool = False, filters: dict = None, kernel: str = "cosine", kernel_params: dict = None) -> list:
+        """Queues one request and waits for its list of recommendation records."""
+        future = asyncio.get_running_loop().create_future()
+        pending = _Pending(song_id, k, (threshold, approximate, filters, kernel, kernel_params), future)
+        self.counters['requests'] += 1
+        try:
+            self.queue.put_nowait(pending)
+        except asyncio.QueueFull:
+            self.counters['rejected'] += 1
+            metrics.inc('service_requests_total', status='rejected')
+            raise Overloaded() from None
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            metrics.inc('service_requests_total', status='timeout')
+            raise
+
+    async def _collect(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Requests that already timed out are not worth scoring
+            live = [p for p in batch if not p.future.done()]
+            self.counters['expired'] += len(batch) - len(live)
+            if not live:
+                continue
+            self.counters['batches'] += 1
+            self.counters['batched_requests'] += len(live)
+            metrics.observe('service_batch_size', len(live))
+            try:
+                outcomes = await loop.run_in_executor(self._executor, self._score, live)
+            except Exception as e:
+                logger.exception("Batch scoring failed")
+                outcomes = [e] * len(live)
+            for pending, outcome in zip(live, outcomes):
+                if pending.future.done():
+                    continue
+                if isinstance(outcome, Exception):
+                    pending.future.set_exception(outcome)
+                else:
+                    pending.future.set_result(outcome)
+
+    def _score(self, batch: list) -> list:
+        """Scores a batch on the worker thread; returns a result or exception per request."""
+        groups = {}
+        for pos, pending in enumerate(batch):
+            groups.setdefault(pending.key, []).append(pos)
+
+        outcomes = [None] * len(batch)
+        with metrics.span("service.batch"):
+            for positions in groups.values():
+                try:
+                    results = self._score_group([batch[p] for p in positions])
+                except ValueError as e:
+                    results = [ServiceError(400, str(e))] * len(positions)
+                except Exception as e:
+                    logger.exception("Scoring failed")
+                    results = [e] * len(positions)
+                for pos, result in zip(positions, results):
+                    outcomes[pos] = result
+        return outcomes
+
+    def _score_group(self, group: list) -> list:
+        threshold, approximate, filters, kernel, kernel_params = group[0].options
+        index = self.agent.index
+        seeds = list(dict.fromkeys(p.song_id for p in group))
+        # One critical section: compaction of an incremental index must not
+        # renumber rows between scoring and the metadata lookup
+        with index.pinned():
+            frame = self.agent.recommend_batch(
+                seeds, k=max(p.k for p in group), threshold=threshold, block_size=len(seeds),
+                approximate=approximate, filters=filters, kernel=kernel, kernel_params=kernel_params,
+            )
+            rows = index.rows_for(frame["song_id"].to_numpy())
+            meta = index.metadata_rows(rows)
+        records = frame[["song_id", "similarity"]].copy()
+        for column in RESULT_COLUMNS:
+            if column in meta.columns:
+                records[column] = meta[column].to_numpy()
+        records = records.to_dict("records")
+
+        by_seed = {}
+        for seed_id, record in zip(frame["seed_id"].tolist(), records):
+            by_seed.setdefault(seed_id, []).append(record)
+        return [by_seed.get(p.song_id, [])[:p.k] for p in group]
+
+    def stats(self) -> dict:
+        batches = self.counters['batches']
+        return dict(self.counters, queued=self.queue.qsize(), mean_batch_size=self.counters['batched_requests'] / batches if batches else 0.0)
+
+
+class RecommendationService:
+    """
+    Minimal HTTP/1.1 front end (keep-alive, JSON bodies) for a MicroBatcher.
+    Uses only asyncio streams, so it needs nothing beyond the scoring stack.
+    """
+
+    def __init__(self, agent: RecommendationAgent, host: str = "127.0.0.1", port: int = 8080, **batcher_options):
+        if agent.index is None:
+            raise ValueError("No feature index loaded; call build_index() or load_index() first.")
+        self.agent = agent
+        self.host = host
+        self.port = port
+        self.batcher_options = batcher_options
+        self.batcher = None
+        self._server = None
+
+    async def start(self):
+        self.batcher = MicroBatcher(self.agent, **self.batcher_options)
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Serving recommendations on http://%s:%d", self.host, self.port)
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self.batcher is not None:
+            await self.batcher.stop()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request line"}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                raw_length = headers.get("content-length") or "0"
+                if not (raw_length.isascii() and raw_length.isdigit()):
+                    await self._respond(writer, 400, {"error": "Invalid Content-Length"}, keep_alive=False)
+                    break
+                length = int(raw_length)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "Request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self._dispatch(method, urlsplit(target).path, body)
+                metrics.inc('service_responses_total', status=str(status))
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, body: bytes):
+        try:
+            if path == "/recommend":
+                if method != "POST":
+                    raise ServiceError(405, "Use POST /recommend")
+                return 200, {"recommendations": await self._recommend(body)}
+            if path == "/health" and method == "GET":
+                index = self.agent.index
+                return 200, {"status": "ok", "songs": len(index), "version": index.version, "queued": self.batcher.queue.qsize()}
+            if path == "/stats" and method == "GET":
+                return 200, self.batcher.stats()
+            raise ServiceError(404, f"No route for {method} {path}")
+        except ServiceError as e:
+            return e.status, {"error": str(e)}
+        except asyncio.TimeoutError:
+            return 504, {"error": f"No answer within {self.batcher.timeout:g}s"}
+        except Exception:
+            logger.exception("Request failed")
+            return 500, {"error": "Internal error"}
+
+    async def _recommend(self, body: bytes) -> list:
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise ServiceError(400, "Body must be JSON") from None
+        if not isinstance(request, dict) or "song_id" not in request:
+            raise ServiceError(400, "song_id is required")
+
+        song_id = request["song_id"]
+        if not isinstance(song_id, (str, int)) or isinstance(song_id, bool):
+            raise ServiceError(400, "song_id must be a string or an integer")
+        if self.agent.index.rows_for([song_id])[0] < 0:
+            raise ServiceError(404, f"Unknown song_id: {song_id}")
+        try:
+            k = int(request.get("k", 5))
+            threshold = float(request.get("threshold", 0.0))
+        except (TypeError, ValueError):
+            raise ServiceError(400, "k and threshold must be numbers") from None
+        if not 1 <= k <= MAX_K:
+            raise ServiceError(400, f"k must be between 1 and {MAX_K}")
+        if not isinstance(request.get("kernel", "cosine"), str):
+            raise ServiceError(400, "kernel must be a string")
+        if not isinstance(request.get("kernel_params") or {}, dict):
+            raise ServiceError(400, "kernel_params must be an object")
+
+        return await self.batcher.submit(
+            song_id, k, threshold,
+            approximate=bool(request.get("approximate", False)),
+            filters=_filters_from_json(request.get("filters")),
+            kernel=request.get("kernel", "cosine"),
+            kernel_params=request.get("kernel_params") or None,
+        )
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool = True):
+        body = json.dumps(payload, default=_json_default).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        )
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", required=True, help="FeatureIndex file written by FeatureIndex.save")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch", type=int, default=256, help="most requests scored together")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="how long the first request of a batch waits for company")
+    parser.add_argument("--max-queue", type=int, default=4096, help="pending requests before answering 503")
+    parser.add_argument("--timeout", type=float, default=1.0, help="seconds before a request gets 504")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    agent = RecommendationAgent(index=FeatureIndex.load(args.index))
+    service = RecommendationService(
+        agent, args.host, args.port,
+        max_batch=args.max_batch, max_wait_ms=args.max_wait_ms, max_queue=args.max_queue, timeout=args.timeout,
+    )
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# src/utils/artist_genres.py
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from src.utils import metrics
+
+SPOTIFY_ARTISTS_BATCH = 50  # max ids accepted by GET /v1/artists
+
+
+class ArtistGenreResolver:
+    """
+    Resolves Spotify artist ids to a "first genre" guess with as few
+    round-trips as possible.
+
+    Unknown ids are grouped into batched `sp.artists(...)` calls (50 ids per
+    request) that run on a small thread pool.  Results are memoised per
+    artist, and concurrent requests for an artist that is already being
+    fetched wait on the same in-flight lookup instead of issuing another.
+    For local testing, point `sp.prefix` at a stub server, as
+    tests/test_artist_genres.py does.
+    """
+
+    def __init__(self, sp, max_workers: int = 4, batch_size: int = SPOTIFY_ARTISTS_BATCH):
+        self.sp = sp
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="artist-genres")
+        self._lock = threading.Lock()
+        self._genres = {}    # artist_id -> genre ("" when Spotify lists none)
+        self._inflight = {}  # artist_id -> Future
+
+    def _fetch(self, artist_ids: list, futures: dict):
+        try:
+            metrics.inc("spotify_calls_total", endpoint="artists")
+            response = self.sp.artists(artist_ids)
+            found = {
+                artist['id']: (artist.get('genres') or [""])[0]
+                for artist in response.get('artists', []) if artist
+            }
+        except Exception as e:
+            logging.error(f"Error fetching artist genres from Spotify: {e}")
+            found = None
+
+        with self._lock:
+            for artist_id in artist_ids:
+                genre = "" if found is None else found.get(artist_id, "")
+                if found is not None:
+                    self._genres[artist_id] = genre
+                self._inflight.pop(artist_id, None)
+                futures[artist_id].set_result(genre)
+
+    def resolve(self, artist_ids) -> dict:
+        """Returns {artist_id: genre} for every id in `artist_ids`."""
+        results, pending, to_fetch = {}, {}, {}
+        with self._lock:
+            for artist_id in dict.fromkeys(artist_ids):
+                if artist_id in self._genres:
+                    metrics.inc("artist_genre_lookups_total", result="memo_hit")
+                    results[artist_id] = self._genres[artist_id]
+                elif artist_id in self._inflight:
+                    metrics.inc("artist_genre_lookups_total", result="coalesced")
+                    pending[artist_id] = self._inflight[artist_id]
+                else:
+                    metrics.inc("artist_genre_lookups_total", result="fetched")
+                    future = Future()
+                    self._inflight[artist_id] = future
+                    pending[artist_id] = to_fetch[artist_id] = future
+
+        ids = list(to_fetch)
+        for start in range(0, len(ids), self.batch_size):
+            self._executor.submit(self._fetch, ids[start:start + self.batch_size], to_fetch)
+
+        wait(pending.values())
+        results.update({artist_id: future.result() for artist_id, future in pending.items()})
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -1,40 +1,133 @@
-import json, os, time
+import json, os, sqlite3, threading, time
+from collections import OrderedDict
 from typing import Any, Dict
 
+from src.utils import metrics
+
 CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'cache')
-RECS_FILE = os.path.join(CACHE_PATH, 'recommendations_cache.json')
+RECS_DB = os.path.join(CACHE_PATH, 'recommendations_cache.sqlite3')
 TTL_SECONDS = 60*60*24  # 1 day
+MEMORY_MAX_ENTRIES = 1024  # size of the in-process LRU tier
+
+
+class TieredCache:
+    """
+    Bounded in-process LRU tier (with TTL) in front of a SQLite store.
+
+    The SQLite file runs in WAL mode, so several processes (e.g. Streamlit
+    replicas) can read and write individual keys concurrently without
+    rewriting the whole cache.  Values must be JSON-serialisable.  The
+    memory tier is per process, so a key rewritten elsewhere may be served
+    stale until its TTL runs out.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = TTL_SECONDS, max_entries: int = MEMORY_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections must not be shared across fork(), so reopen per process.
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, ts REAL NOT NULL)')
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _remember(self, key: str, ts: float, value: Any):
+        self._memory[key] = (ts, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters['evictions'] += 1
+            metrics.inc('cache_evictions_total')
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    metrics.inc('cache_requests_total', result='memory_hit')
+                    return entry[1]
+                del self._memory[key]
+
+            row = self._connection().execute('SELECT value, ts FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.counters['misses'] += 1
+                metrics.inc('cache_requests_total', result='miss')
+                return None
+            if now - row[1] > self.ttl_seconds:
+                # stale; only delete the row we saw, in case another process refreshed it
+                self._connection().execute('DELETE FROM cache WHERE key = ? AND ts = ?', (key, row[1]))
+                self.counters['expirations'] += 1
+                self.counters['misses'] += 1
+                metrics.inc('cache_requests_total', result='expired')
+                return None
 
-os.makedirs(CACHE_PATH, exist_ok=True)
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            self.counters['disk_hits'] += 1
+            metrics.inc('cache_requests_total', result='disk_hit')
+            return value
 
+    def set(self, key: str, value: Any):
+        ts = time.time()
+        payload = json.dumps(value)
+        with self._lock:
+            self._connection().execute('INSERT OR REPLACE INTO cache (key, value, ts) VALUES (?, ?, ?)', (key, payload, ts))
+            self._remember(key, ts, value)
 
-def _load() -> Dict[str, Any]:
-    if os.path.exists(RECS_FILE):
-        try:
-            with open(RECS_FILE, 'r') as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
+    def purge_expired(self) -> int:
+        """Deletes expired rows from disk; returns how many were removed."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            for key in [k for k, (ts, _) in self._memory.items() if ts < cutoff]:
+                del self._memory[key]
+            removed = self._connection().execute('DELETE FROM cache WHERE ts < ?', (cutoff,)).rowcount
+        self.counters['expirations'] += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._connection().execute('DELETE FROM cache')
+
+    def stats(self) -> Dict[str, int]:
+        hits = self.counters['memory_hits'] + self.counters['disk_hits']
+        return dict(self.counters, hits=hits, memory_entries=len(self._memory))
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def _default() -> TieredCache:
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = TieredCache(RECS_DB)
+    return _default_cache
 
-def _save(data: Dict[str, Any]):
-    with open(RECS_FILE, 'w') as f:
-        json.dump(data, f)
 
 def get(key: str):
-    data = _load()
-    entry = data.get(key)
-    if not entry:
-        return None
-    if time.time() - entry['ts'] > TTL_SECONDS:
-        # stale
-        data.pop(key, None)
-        _save(data)
-        return None
-    return entry['value']
+    return _default().get(key)
 
 
 def set(key: str, value: Any):
-    data = _load()
-    data[key] = {'value': value, 'ts': time.time()}
-    _save(data) 
\ No newline at end of file
+    _default().set(key, value)
+
+
+def stats() -> Dict[str, int]:
+    return _default().stats()
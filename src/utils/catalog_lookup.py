@@ -0,0 +1,122 @@
+# src/utils/catalog_lookup.py
+
+import bisect
+
+import numpy as np
+import pandas as pd
+
+
+def _fold(values) -> np.ndarray:
+    """Case-folds a column of strings (missing values become "")."""
+    return pd.Series(values).astype("string").str.casefold().fillna("").to_numpy(dtype=object)
+
+
+def _trigrams(text: str):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _KeyIndex:
+    """Case-folded key -> row indices, stored CSR-style (one offsets array, one rows array)."""
+
+    def __init__(self, values):
+        codes, self.keys = pd.factorize(_fold(values))
+        self.code_of = {key: code for code, key in enumerate(self.keys)}
+        self.rows = np.argsort(codes, kind="stable")
+        self.offsets = np.zeros(len(self.keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(self.keys)), out=self.offsets[1:])
+
+    def rows_for_code(self, code: int) -> np.ndarray:
+        return self.rows[self.offsets[code]:self.offsets[code + 1]]
+
+    def lookup(self, value: str) -> np.ndarray:
+        code = self.code_of.get(value.casefold())
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return self.rows_for_code(code)
+
+
+class CatalogLookup:
+    """
+    Lookup structures built once over the catalog's title and genre columns.
+
+    Exact title/genre matches are hash lookups returning row-index arrays;
+    `suggest_titles` does prefix matching over the sorted distinct titles and
+    `fuzzy_titles` ranks titles by trigram overlap.  The trigram index is
+    built on first use.
+    """
+
+    def __init__(self, titles, genres):
+        self.titles = np.asarray(pd.Series(titles).astype(object))
+        self._title_index = _KeyIndex(titles)
+        self._genre_index = _KeyIndex(genres)
+
+        keys = self._title_index.keys
+        self._sorted_codes = np.argsort(keys.astype(object), kind="stable")
+        self._sorted_keys = keys[self._sorted_codes].tolist()
+
+        self._trigram_of = None
+        self._trigram_offsets = None
+        self._trigram_codes = None
+        self._trigram_counts = None
+
+    def title_rows(self, title: str) -> np.ndarray:
+        return self._title_index.lookup(title)
+
+    def genre_rows(self, genre: str) -> np.ndarray:
+        return self._genre_index.lookup(genre)
+
+    def suggest_titles(self, prefix: str, limit: int = 10) -> list:
+        """Distinct titles whose case-folded form starts with `prefix`."""
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self._sorted_keys, prefix)
+        results = []
+        for pos in range(start, min(start + limit, len(self._sorted_keys))):
+            if not self._sorted_keys[pos].startswith(prefix):
+                break
+            code = self._sorted_codes[pos]
+            results.append(self.titles[self._title_index.rows_for_code(code)[0]])
+        return results
+
+    def _build_trigrams(self):
+        grams, codes, counts = [], [], np.zeros(len(self._title_index.keys), dtype=np.int32)
+        for code, key in enumerate(self._title_index.keys):
+            key_grams = _trigrams(key)
+            counts[code] = len(key_grams)
+            grams.extend(key_grams)
+            codes.extend([code] * len(key_grams))
+
+        gram_codes, gram_keys = pd.factorize(pd.Series(grams, dtype=object))
+        order = np.argsort(gram_codes, kind="stable")
+        self._trigram_codes = np.asarray(codes, dtype=np.int32)[order]
+        self._trigram_offsets = np.zeros(len(gram_keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(gram_codes, minlength=len(gram_keys)), out=self._trigram_offsets[1:])
+        self._trigram_of = {gram: i for i, gram in enumerate(gram_keys)}
+        self._trigram_counts = counts
+
+    def fuzzy_titles(self, query: str, limit: int = 10, min_score: float = 0.3) -> list:
+        """
+        Titles ranked by trigram Jaccard similarity to `query`.
+        Returns (title, score) pairs.
+        """
+        if self._trigram_of is None:
+            self._build_trigrams()
+
+        query_grams = [g for g in _trigrams(query.casefold()) if g in self._trigram_of]
+        if not query_grams:
+            return []
+        postings = np.concatenate([
+            self._trigram_codes[self._trigram_offsets[i]:self._trigram_offsets[i + 1]]
+            for i in (self._trigram_of[g] for g in query_grams)
+        ])
+        candidates, shared = np.unique(postings, return_counts=True)
+        n_query = len(_trigrams(query.casefold()))
+        scores = shared / (n_query + self._trigram_counts[candidates] - shared)
+
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        best = np.argsort(-scores, kind="stable")[:limit]
+        return [
+            (self.titles[self._title_index.rows_for_code(candidates[i])[0]], float(scores[i]))
+            for i in best
+        ]
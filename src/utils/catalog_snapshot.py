@@ -0,0 +1,238 @@
+# src/utils/catalog_snapshot.py
+"""
+Binary columnar snapshot of the song catalog.
+
+Layout (little endian, every block 64-byte aligned):
+
+    b"MRCSNAP\\0" | uint64 header length | JSON header | blocks...
+
+The header records the format version, row count, schema and the byte
+offset of every block.  Audio features live in one float32 (rows x 9)
+block; string columns (title, artist, genre, ...) are interned into a
+table of unique values plus int32 codes; other numeric columns keep their
+own dtype.  Loading memory-maps the file; `features` and the string codes
+are views of the mapping, so worker processes that build their index from
+`compact_features()` and read result rows with `take()` share those pages.
+`to_frame()` copies every column into the process.
+
+Convert once with:
+
+    python -m src.utils.catalog_snapshot data/mock_songs.csv data/mock_songs.snap
+"""
+
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+import pandas as pd
+
+from src.index.feature_index import NUMERICAL_FEATURES
+
+MAGIC = b"MRCSNAP\0"
+FORMAT_VERSION = 1
+_ALIGN = 64
+
+
+def is_snapshot(path: str) -> bool:
+    """True if `path` starts with the snapshot magic bytes."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _pad(f) -> int:
+    offset = f.tell()
+    padding = -offset % _ALIGN
+    f.write(b"\0" * padding)
+    return offset + padding
+
+
+def write_snapshot(song_data: pd.DataFrame, path: str) -> None:
+    """Writes `song_data` (FeatureEngineeringAgent schema) as a snapshot."""
+    features = [f for f in NUMERICAL_FEATURES if f in song_data.columns]
+    blocks = []  # (name, array)
+    columns = []
+
+    if features:
+        blocks.append(("features", np.ascontiguousarray(song_data[features].to_numpy(dtype=np.float32))))
+
+    for col in song_data.columns:
+        if col in features:
+            columns.append({"name": col, "kind": "feature", "position": features.index(col)})
+            continue
+        series = song_data[col]
+        values = series.to_numpy()
+        if values.dtype != object and (pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype)):
+            columns.append({"name": col, "kind": "numeric"})
+            blocks.append((f"{col}.values", np.ascontiguousarray(values)))
+        else:
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            encoded = [str(v).encode("utf-8") for v in uniques]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+            columns.append({"name": col, "kind": "string"})
+            blocks.append((f"{col}.codes", codes.astype(np.int32)))
+            blocks.append((f"{col}.offsets", offsets))
+            blocks.append((f"{col}.blob", np.frombuffer(b"".join(encoded), dtype=np.uint8)))
+
+    # Offsets depend on the header size, so lay blocks out relative to the data start first.
+    layout, cursor = {}, 0
+    for name, array in blocks:
+        cursor += -cursor % _ALIGN
+        layout[name] = {"offset": cursor, "dtype": array.dtype.str, "shape": list(array.shape)}
+        cursor += array.nbytes
+
+    header = {
+        "version": FORMAT_VERSION,
+        "n_rows": len(song_data),
+        "feature_names": features,
+        "columns": columns,
+        "blocks": layout,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = len(MAGIC) + 8 + len(header_bytes)
+    data_start += -data_start % _ALIGN
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (data_start - f.tell()))
+        for name, array in blocks:
+            _pad(f)
+            assert f.tell() - data_start == layout[name]["offset"]
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+
+class CatalogSnapshot:
+    """
+    Read-only, memory-mapped view of a catalog snapshot.
+
+    `features` is a float32 (rows x features) array backed by the file;
+    columns are materialised on demand.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a catalog snapshot.")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            self.header = json.loads(f.read(header_len).decode("utf-8"))
+        if self.header["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported catalog snapshot version: {self.header['version']}")
+
+        data_start = len(MAGIC) + 8 + header_len
+        data_start += -data_start % _ALIGN
+        self._raw = np.memmap(path, dtype=np.uint8, mode="r")
+        self._data_start = data_start
+
+        self.n_rows = self.header["n_rows"]
+        self.feature_names = self.header["feature_names"]
+        self.columns = [c["name"] for c in self.header["columns"]]
+        self._columns = {c["name"]: c for c in self.header["columns"]}
+        self.features = self._block("features") if self.feature_names else np.empty((self.n_rows, 0), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def _block(self, name: str) -> np.ndarray:
+        spec = self.header["blocks"][name]
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        start = self._data_start + spec["offset"]
+        return self._raw[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+
+    def strings(self, name: str) -> np.ndarray:
+        """The interned table of unique values for a string column."""
+        offsets, blob = self._block(f"{name}.offsets"), self._block(f"{name}.blob").tobytes()
+        return np.array([blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)], dtype=object)
+
+    def codes(self, name: str) -> np.ndarray:
+        """Memory-mapped int32 codes of a string column (-1 for missing)."""
+        return self._block(f"{name}.codes")
+
+    def keys(self, name: str) -> np.ndarray:
+        """
+        Values that compare equal exactly when the column's values do, without
+        decoding strings: the codes of a string column, else the column itself.
+        """
+        if self._columns[name]["kind"] == "string":
+            return self.codes(name)
+        return self.column(name)
+
+    def _strings_at(self, name: str, codes: np.ndarray) -> np.ndarray:
+        """Decodes only the given codes of a string column (NaN for missing)."""
+        offsets, blob = self._block(f"{name}.offsets"), self._block(f"{name}.blob")
+        return np.array(
+            [np.nan if c < 0 else blob[offsets[c]:offsets[c + 1]].tobytes().decode("utf-8") for c in codes.tolist()],
+            dtype=object,
+        )
+
+    def column(self, name: str):
+        """Returns one column; string columns come back as pandas Categoricals."""
+        spec = self._columns[name]
+        if spec["kind"] == "feature":
+            return self.features[:, spec["position"]]
+        if spec["kind"] == "numeric":
+            return self._block(f"{name}.values")
+        return pd.Categorical.from_codes(self.codes(name), categories=self.strings(name))
+
+    def take(self, rows, columns=None) -> pd.DataFrame:
+        """
+        Materialises only `rows` (positions) of the snapshot as a DataFrame,
+        indexed by position; string columns are decoded for those rows only.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        out = {}
+        for name in columns or self.columns:
+            spec = self._columns[name]
+            if spec["kind"] == "feature":
+                out[name] = self.features[rows, spec["position"]]
+            elif spec["kind"] == "numeric":
+                out[name] = self._block(f"{name}.values")[rows]
+            else:
+                out[name] = self._strings_at(name, self.codes(name)[rows])
+        return pd.DataFrame(out, index=rows)
+
+    def compact_features(self):
+        """
+        CompactFeatures whose matrix is the memory-mapped feature block itself;
+        only the non-feature columns are materialised, as metadata.
+        """
+        from src.agents.feature_engineering_agent import CompactFeatures
+
+        metadata = pd.DataFrame({
+            name: self.column(name) for name in self.columns if self._columns[name]["kind"] != "feature"
+        })
+        return CompactFeatures(self.features, list(self.feature_names), metadata)
+
+    def to_frame(self, columns=None) -> pd.DataFrame:
+        """Materialises (copies) the snapshot, or a subset of columns, as a DataFrame."""
+        columns = columns or self.columns
+        return pd.DataFrame({name: self.column(name) for name in columns})
+
+
+def load_snapshot(path: str) -> CatalogSnapshot:
+    return CatalogSnapshot(path)
+
+
+def convert_csv(csv_path: str, snapshot_path: str) -> None:
+    """One-time conversion of a catalog CSV into a snapshot."""
+    from src.agents.feature_engineering_agent import FeatureEngineeringAgent
+
+    song_data = FeatureEngineeringAgent().get_features(pd.read_csv(csv_path))
+    write_snapshot(song_data, snapshot_path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python -m src.utils.catalog_snapshot <input.csv> <output.snap>")
+        sys.exit(1)
+    convert_csv(sys.argv[1], sys.argv[2])
@@ -1,6 +1,5 @@
 # utils/helpers.py
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
 def calculate_similarity(song1_features, song2_features):
     # Explicitly select numerical features
@@ -15,11 +14,12 @@ def calculate_similarity(song1_features, song2_features):
     if np.isnan(features1).any() or np.isnan(features2).any():
       return 0.0 #Return 0 if there is nan
 
-    distance = np.linalg.norm(features1 - features2)
-    similarity = 1 / (1 + distance)
-    return similarity
+    from src.index.kernels import euclidean_inverse
+    return float(euclidean_inverse(features1[None, :], features2[None, :])[0, 0])
 
 def calculate_embedding_similarity(embedding1, embedding2): # Will be used in later stages
-    embedding1 = np.array(embedding1).reshape(1, -1)
-    embedding2 = np.array(embedding2).reshape(1, -1)
-    return cosine_similarity(embedding1, embedding2)[0][0]
\ No newline at end of file
+    # Single-pair wrapper around the vectorised kernel (zero vectors score 0)
+    from src.index.kernels import cosine
+    embedding1 = np.asarray(embedding1, dtype=np.float64).reshape(1, -1)
+    embedding2 = np.asarray(embedding2, dtype=np.float64).reshape(1, -1)
+    return float(cosine(embedding1, embedding2)[0, 0])
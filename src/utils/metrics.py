@@ -0,0 +1,278 @@
+# src/utils/metrics.py
+"""
+Lightweight instrumentation for the agents.
+
+    from src.utils import metrics
+
+    with metrics.span("recommendation.search"):
+        ...
+
+    @metrics.timed("feature_engineering.run")
+    def run(...): ...
+
+    metrics.inc("cache_requests_total", result="miss")
+
+Everything is a no-op until `enable()` is called (or the environment sets
+MUSIC_RECOMMENDER_METRICS=1), so the disabled cost is one global check.
+Span durations are recorded as latency histograms in a MetricsRegistry and
+forwarded to any exporters: LogExporter writes log lines,
+PrometheusExporter renders/serves the text exposition format, and
+InMemoryExporter keeps spans in a list for tests.
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SPAN_METRIC = "span_duration_seconds"
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted(labels.items())))
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus semantics)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound containing the q-th quantile (approximate)."""
+        if self.count == 0:
+            return 0.0
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """In-memory store of counters and histograms, keyed by name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        return self.counters.get(_key(name, labels), 0)
+
+    def histogram(self, name: str, **labels):
+        return self.histograms.get(_key(name, labels))
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+class LogExporter:
+    """Writes one log line per finished span."""
+
+    def __init__(self, level: int = logging.INFO, min_seconds: float = 0.0):
+        self.level = level
+        self.min_seconds = min_seconds
+
+    def export_span(self, name: str, seconds: float, labels: dict):
+        if seconds >= self.min_seconds:
+            extra = " ".join(f"{k}={v}" for k, v in labels.items())
+            logging.log(self.level, f"span {name} took {seconds * 1000:.2f} ms {extra}".rstrip())
+
+
+class InMemoryExporter:
+    """Collects (name, seconds, labels) tuples; meant for tests."""
+
+    def __init__(self):
+        self.spans = []
+
+    def export_span(self, name: str, seconds: float, labels: dict):
+        self.spans.append((name, seconds, labels))
+
+
+class PrometheusExporter:
+    """Renders a registry in the Prometheus text format and can serve it over HTTP."""
+
+    def __init__(self, registry: MetricsRegistry = None, prefix: str = "music_recommender_"):
+        self.registry = registry
+        self.prefix = prefix
+        self._server = None
+
+    def export_span(self, name: str, seconds: float, labels: dict):
+        pass  # pull-based; spans are already in the registry histograms
+
+    @staticmethod
+    def _labels(labels, extra=()) -> str:
+        items = list(labels) + list(extra)
+        if not items:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+    def render(self) -> str:
+        registry = self.registry or _registry
+        lines = []
+        with registry._lock:
+            counters = sorted(registry.counters.items())
+            histograms = sorted(registry.histograms.items(), key=lambda item: item[0])
+            for (name, labels), value in counters:
+                lines.append(f"{self.prefix}{name}{self._labels(labels)} {value}")
+            for (name, labels), hist in histograms:
+                cumulative = 0
+                for bound, count in zip(hist.buckets + (float("inf"),), hist.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.prefix}{name}_bucket{self._labels(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{self.prefix}{name}_sum{self._labels(labels)} {hist.sum}")
+                lines.append(f"{self.prefix}{name}_count{self._labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9100, host: str = "127.0.0.1"):
+        """Starts a background HTTP server exposing GET /metrics."""
+        exporter = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+_enabled = os.getenv("MUSIC_RECOMMENDER_METRICS", "") not in ("", "0")
+_registry = MetricsRegistry()
+_exporters = []
+
+
+def enable(registry: MetricsRegistry = None, exporters=None):
+    """Turns instrumentation on, optionally swapping the registry/exporters."""
+    global _enabled, _registry, _exporters
+    if registry is not None:
+        _registry = registry
+    if exporters is not None:
+        _exporters = list(exporters)
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def registry() -> MetricsRegistry:
+    return _registry
+
+
+def inc(name: str, value: float = 1, **labels):
+    if _enabled:
+        _registry.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    if _enabled:
+        _registry.observe(name, value, **labels)
+
+
+class _Span:
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        labels = dict(self.labels, span=self.name)
+        if exc_type is not None:
+            labels["error"] = exc_type.__name__
+        _registry.observe(SPAN_METRIC, seconds, **labels)
+        for exporter in _exporters:
+            exporter.export_span(self.name, seconds, labels)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **labels):
+    """Context manager timing a block as span `name`."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, labels)
+
+
+def timed(name: str = None):
+    """Decorator form of `span`; defaults to the function's qualified name."""
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
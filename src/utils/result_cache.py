@@ -0,0 +1,149 @@
+# src/utils/result_cache.py
+
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+from src.utils import metrics
+
+RESULT_CACHE_MAX_ENTRIES = 4096
+RESULT_CACHE_MAX_BYTES = 64 * 2**20
+
+
+def sizeof(value: Any) -> int:
+    """Approximate in-memory size of a cached result."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return sys.getsizeof(value)
+
+
+def freeze(value: Any):
+    """Turns filter dicts / lists into a hashable, order-independent cache key part."""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), freeze(v)) for k, v in value.items()))
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, set, frozenset)):
+        return ("in",) + tuple(sorted(map(repr, value)))
+    if isinstance(value, tuple):
+        return ("range",) + tuple(freeze(v) for v in value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def freeze_params(value: Any):
+    """
+    Hashable cache key part for kernel parameters.  Unlike `freeze`,
+    sequences keep their order: positional weights [5, 1] and [1, 5] differ.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), freeze_params(v)) for k, v in value.items()))
+    if isinstance(value, np.ndarray):
+        return ("array", str(value.dtype), value.shape, tuple(value.ravel().tolist()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_params(v) for v in value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class ResultCache:
+    """
+    In-process memo of computed results (e.g. recommendation frames),
+    keyed on a catalog version plus a request key.
+
+    Bounded both by entry count and by the accounted size of the stored
+    values (least recently used first out).  All entries are dropped as
+    soon as a lookup arrives with a different catalog version, so results
+    never outlive the index they came from.  Concurrent misses for the same
+    key are single-flighted: one caller computes, the others wait for its
+    result.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = None
+        self.nbytes = 0
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()  # key -> (value, size)
+        self._inflight: Dict[Any, Future] = {}
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'invalidations': 0}
+
+    def _set_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self.counters['invalidations'] += 1
+                metrics.inc('result_cache_invalidations_total')
+            self._entries.clear()
+            self.nbytes = 0
+            self.version = version
+
+    def _store(self, key, value):
+        size = sizeof(value)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old[1]
+        self._entries[key] = (value, size)
+        self.nbytes += size
+        while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+            self.counters['evictions'] += 1
+            metrics.inc('result_cache_evictions_total')
+
+    def get_or_compute(self, version, key, compute: Callable[[], Any]):
+        """Returns the cached value for (version, key), computing it at most once."""
+        with self._lock:
+            self._set_version(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counters['hits'] += 1
+                metrics.inc('result_cache_requests_total', result='hit')
+                return entry[0]
+            future = self._inflight.get((version, key))
+            owner = future is None
+            if owner:
+                future = self._inflight[(version, key)] = Future()
+                self.counters['misses'] += 1
+                metrics.inc('result_cache_requests_total', result='miss')
+            else:
+                self.counters['coalesced'] += 1
+                metrics.inc('result_cache_requests_total', result='coalesced')
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[(version, key)]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[(version, key)]
+            if version == self.version:
+                self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters, entries=len(self._entries), nbytes=self.nbytes)
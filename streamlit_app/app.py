@@ -7,6 +7,8 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.agents import FeatureEngineeringAgent, RecommendationAgent, DataAcquisitionAgent
+from src.utils.catalog_snapshot import CatalogSnapshot, load_snapshot
+from src.utils.result_cache import ResultCache
 from dotenv import load_dotenv
 
 st.set_page_config(page_title="Music Recommender Demo")
@@ -18,16 +20,45 @@ st.markdown(
     "Select a song from the list below to see the top 5 most similar tracks based on audio features."
 )
 
+DATA_PATH = "data/mock_songs.csv"
+SNAPSHOT_PATH = "data/mock_songs.snap"  # optional, see src/utils/catalog_snapshot.py
+INDEX_PATH = "data/feature_index.npz"
+
 def load_data():
-    """Loads the dataset from the CSV file."""
+    """
+    Loads the dataset, preferring the memory-mapped snapshot over the CSV.
+    A snapshot is returned as is (not copied into a DataFrame), so the index
+    is built from its mapped feature block.
+    """
     try:
-        return pd.read_csv("data/mock_songs.csv")
+        if os.path.exists(SNAPSHOT_PATH):
+            return load_snapshot(SNAPSHOT_PATH)
+        return pd.read_csv(DATA_PATH)
     except FileNotFoundError:
         st.error("Error: The data file 'data/mock_songs.csv' was not found. Please make sure the file is in the correct directory.")
         return pd.DataFrame()
 
 songs = load_data()
 
+@st.cache_resource
+def load_recommender(_songs_df):
+    """
+    Loads the persisted feature index (rebuilding it if the CSV is newer) once
+    per process.  Answers are memoised per index version, so popular seeds
+    are only scored once.
+    """
+    agent = RecommendationAgent(result_cache=ResultCache())
+    source_path = SNAPSHOT_PATH if os.path.exists(SNAPSHOT_PATH) else DATA_PATH
+    if os.path.exists(INDEX_PATH) and os.path.getmtime(INDEX_PATH) >= os.path.getmtime(source_path):
+        agent.load_index(INDEX_PATH)
+    else:
+        if isinstance(_songs_df, CatalogSnapshot):
+            features = _songs_df.compact_features()
+        else:
+            features = FeatureEngineeringAgent().run(_songs_df)
+        agent.build_index(features).save(INDEX_PATH)
+    return agent
+
 # --- UI: Select Data Source --------------------------------------------------
 source = st.radio("Select data source", ["Offline dataset", "Spotify API"], index=0)
 
@@ -35,24 +66,23 @@ source = st.radio("Select data source", ["Offline dataset", "Spotify API"], inde
 
 def get_recommendations(song_title, songs_df, num_recs=5):
     """Gets song recommendations based on a seed song title from the offline dataset."""
-    if song_title not in songs_df["title"].values:
+    rec_agent = load_recommender(songs_df)
+    index = rec_agent.index
+    matches = (index.metadata["title"] == song_title).to_numpy().nonzero()[0]
+    if len(matches) == 0:
         return pd.DataFrame()
 
-    seed_df = songs_df[songs_df["title"] == song_title]
-    rest_df = songs_df[songs_df["title"] != song_title]
-    combined = pd.concat([seed_df, rest_df], ignore_index=True)
-
-    fe_agent = FeatureEngineeringAgent()
-    features = fe_agent.run(combined)
-
-    rec_agent = RecommendationAgent()
-    recs = rec_agent.recommend_songs(features, num_recommendations=num_recs)
-    return recs
+    seed_id = index.song_ids[matches[0]]
+    return rec_agent.recommend_by_id(seed_id, num_recommendations=num_recs)
 
 # --- OFFLINE DATASET MODE ----------------------------------------------------
-if source == "Offline dataset" and not songs.empty:
+if source == "Offline dataset" and len(songs):
     st.subheader("Offline Mode: Select a Song")
-    title = st.selectbox("Choose a song title", songs["title"].unique().tolist())
+    if isinstance(songs, CatalogSnapshot):
+        titles = songs.strings("title").tolist()  # the interned table: distinct titles, first-seen order
+    else:
+        titles = songs["title"].unique().tolist()
+    title = st.selectbox("Choose a song title", titles)
 
     if st.button("Get Recommendations", key="offline_btn"):
         with st.spinner(f"Finding songs similar to '{title}'..."):
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# Add project root to path to allow absolute imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
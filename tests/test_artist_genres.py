@@ -0,0 +1,128 @@
+# tests/test_artist_genres.py
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from src.utils import metrics
+from src.utils.artist_genres import SPOTIFY_ARTISTS_BATCH, ArtistGenreResolver
+
+
+def artist(artist_id: str) -> dict:
+    number = int(artist_id[1:])
+    return {"id": artist_id, "genres": [f"genre-{number % 7}"] if number % 5 else []}
+
+
+class FakeSpotify:
+    """Stands in for spotipy.Spotify: records every sp.artists() batch, optionally blocks until released."""
+
+    def __init__(self, gate: threading.Event = None):
+        self.calls = []
+        self.gate = gate
+        self._lock = threading.Lock()
+
+    def artists(self, artist_ids):
+        with self._lock:
+            self.calls.append(list(artist_ids))
+        if self.gate is not None:
+            self.gate.wait(5)
+        return {"artists": [artist(a) for a in artist_ids]}
+
+
+@pytest.fixture
+def registry():
+    registry = metrics.MetricsRegistry()
+    was_enabled, previous = metrics.is_enabled(), metrics.registry()
+    metrics.enable(registry)
+    yield registry
+    metrics.enable(previous)
+    if not was_enabled:
+        metrics.disable()
+
+
+def test_lookups_are_batched_and_memoised():
+    sp = FakeSpotify()
+    resolver = ArtistGenreResolver(sp)
+    ids = [f"a{i}" for i in range(120)]
+
+    genres = resolver.resolve(ids + ids[:30])  # repeats within one call
+    assert genres == {a: (artist(a)["genres"] or [""])[0] for a in ids}
+    assert sorted(len(c) for c in sp.calls) == [20, SPOTIFY_ARTISTS_BATCH, SPOTIFY_ARTISTS_BATCH]
+    assert sorted(a for c in sp.calls for a in c) == sorted(ids)
+
+    resolver.resolve(ids[:60])  # all memoised
+    assert len(sp.calls) == 3
+    resolver.resolve(ids[:10] + ["a500"])
+    assert sp.calls[-1] == ["a500"]
+    resolver.close()
+
+
+def test_concurrent_callers_share_in_flight_lookups(registry):
+    gate = threading.Event()
+    sp = FakeSpotify(gate)
+    resolver = ArtistGenreResolver(sp)
+    ids = [f"a{i}" for i in range(40)]
+    results = {}
+
+    first = threading.Thread(target=lambda: results.setdefault("first", resolver.resolve(ids)))
+    first.start()
+    deadline = time.monotonic() + 5
+    while not sp.calls and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+    second = threading.Thread(target=lambda: results.setdefault("second", resolver.resolve(ids[10:] + ["a99"])))
+    second.start()
+    while registry.counter("artist_genre_lookups_total", result="coalesced") < 30 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    gate.set()
+    first.join(5)
+    second.join(5)
+
+    assert registry.counter("artist_genre_lookups_total", result="coalesced") == 30
+    assert sorted(a for c in sp.calls for a in c) == sorted(ids + ["a99"])  # each artist fetched once
+    assert results["second"] == {a: results["first"].get(a, "") for a in ids[10:]} | {"a99": "genre-1"}
+    resolver.close()
+
+
+class _StubSpotify(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") != "/v1/artists":
+            self.send_error(404)
+            return
+        ids = parse_qs(url.query)["ids"][0].split(",")
+        type(self).requests.append(ids)
+        body = json.dumps({"artists": [artist(a) for a in ids]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_against_local_stub_spotify_server():
+    spotipy = pytest.importorskip("spotipy")
+    _StubSpotify.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubSpotify)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        sp = spotipy.Spotify(auth="stub-token", retries=0)
+        sp.prefix = f"http://127.0.0.1:{server.server_address[1]}/v1/"
+        resolver = ArtistGenreResolver(sp)
+        ids = [f"a{i}" for i in range(60)]
+        tracks = ids + ids[:40]  # 100 tracks by 60 artists
+        genres = resolver.resolve(tracks)
+        resolver.close()
+    finally:
+        server.shutdown()
+    assert genres["a1"] == "genre-1" and genres["a0"] == ""
+    assert sorted(len(r) for r in _StubSpotify.requests) == [10, 50]
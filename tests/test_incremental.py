@@ -0,0 +1,63 @@
+# tests/test_incremental.py
+
+import numpy as np
+import pandas as pd
+
+from src.index.feature_index import NUMERICAL_FEATURES, FeatureIndex
+from src.index.incremental import IncrementalIndex
+
+
+def make_catalog(n, start=0, seed=0, nan_fraction=0.3):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({"song_id": np.arange(start, start + n, dtype=np.int64), "genre": rng.choice(["rock", "pop"], n)})
+    for name in NUMERICAL_FEATURES:
+        frame[name] = rng.normal(rng.uniform(-5, 5), rng.uniform(0.5, 30), n)
+    frame.loc[rng.random(n) < nan_fraction, "tempo"] = np.nan
+    frame.loc[rng.random(n) < 0.05, "energy"] = np.nan
+    return frame
+
+
+def assert_matches_build(index: IncrementalIndex, catalog: pd.DataFrame):
+    expected = FeatureIndex.build(catalog)
+    np.testing.assert_allclose(index.main.mean, expected.mean, rtol=1e-5)
+    np.testing.assert_allclose(index.main.scale, expected.scale, rtol=1e-5)
+    rows = index.rows_for(expected.song_ids)
+    np.testing.assert_allclose(index.vectors(rows), expected.matrix, atol=1e-5)
+
+
+def test_unrelated_upsert_then_compaction_keeps_the_scaler():
+    full = make_catalog(2001)
+    catalog, extra = full.iloc[:2000], full.iloc[2000:]
+    index = IncrementalIndex.build(catalog, background=False, compact_ratio=10.0)
+    before = index.main.scale.copy()
+
+    index.upsert(extra)
+    index.compact()
+
+    # One more row from the same distribution barely moves the scale (NaN imputation moved it ~16%)
+    np.testing.assert_allclose(index.main.scale, before, rtol=1e-2)
+    assert_matches_build(index, pd.concat([catalog, extra], ignore_index=True))
+
+
+def test_compacted_index_matches_build_after_updates_and_deletes():
+    catalog = make_catalog(3000)
+    index = IncrementalIndex.build(catalog.iloc[:2000], background=False, compact_ratio=10.0)
+
+    index.upsert(catalog.iloc[2000:])
+    replaced = make_catalog(300, seed=2)  # new values (and NaNs) for ids 0..299
+    index.upsert(replaced)
+    deleted = catalog["song_id"].iloc[500:800]
+    index.delete(deleted)
+    index.compact()
+
+    final = pd.concat([replaced, catalog.iloc[300:]], ignore_index=True)
+    final = final[~final["song_id"].isin(deleted)]
+    assert len(index) == len(final)
+    assert_matches_build(index, final)
+
+    seeds = final["song_id"].to_numpy()[:20]
+    expected = FeatureIndex.build(final)
+    got_rows, _ = index.search(index.vectors(index.rows_for(seeds)), 10, exclude=index.rows_for(seeds))
+    want_rows, _ = expected.search(expected.vectors(expected.rows_for(seeds)), 10, exclude=expected.rows_for(seeds))
+    for got, want in zip(got_rows, want_rows):
+        assert index.ids(got).tolist() == expected.ids(want).tolist()
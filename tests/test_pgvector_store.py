@@ -0,0 +1,88 @@
+# tests/test_pgvector_store.py
+"""
+Round trip through a real pgvector server.  Skipped unless PGVECTOR_TEST_DSN
+points at a database with the `vector` extension available, e.g.
+
+    docker run -d -e POSTGRES_PASSWORD=pg -p 5432:5432 pgvector/pgvector:pg16
+    PGVECTOR_TEST_DSN=postgresql://postgres:pg@localhost:5432/postgres python -m pytest tests/test_pgvector_store.py
+"""
+
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+DSN = os.environ.get("PGVECTOR_TEST_DSN")
+pytestmark = pytest.mark.skipif(not DSN, reason="PGVECTOR_TEST_DSN not set")
+
+
+@pytest.fixture
+def catalog():
+    rng = np.random.default_rng(0)
+    n = 300
+    year = rng.integers(1960, 2020, n).astype(np.float64)
+    year[::17] = np.nan  # read_csv gives a float column when years are missing
+    return pd.DataFrame({
+        "song_id": np.arange(1000, 1000 + n, dtype=np.int64),
+        "title": [f"Song {i}" for i in range(n)],
+        "artist": [f"Artist {i % 40}" for i in range(n)],
+        "genre": rng.choice(["rock", "pop", "jazz"], n),
+        "year": year,
+        "popularity": rng.integers(0, 100, n),
+        "explicit": rng.random(n) < 0.2,
+        "tempo": rng.normal(120, 25, n),
+        "danceability": rng.random(n),
+        "energy": rng.random(n).astype(np.float32),
+        "valence": rng.random(n),
+        "loudness": rng.normal(-8, 3, n),
+        "acousticness": rng.random(n),
+        "instrumentalness": rng.random(n),
+        "liveness": rng.random(n),
+        "speechiness": rng.random(n),
+    })
+
+
+@pytest.fixture
+def agent(catalog):
+    pytest.importorskip("psycopg2")
+    from src.agents.recommendation_agent import RecommendationAgent
+    from src.database.pgvector_store import PgVectorStore
+    from psycopg2 import sql
+
+    store = PgVectorStore(DSN, table=f"songs_test_{uuid.uuid4().hex[:8]}")
+    agent = RecommendationAgent(store=store)
+    agent.build_index(catalog)
+    store.ensure_schema()
+    yield agent
+    store._run(lambda cur: cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(store.table))))
+    store.close()
+
+
+def test_integer_ids_round_trip_and_match_exact_search(agent, catalog):
+    store = agent.store
+    assert store.load_index(agent.index) == len(catalog)
+    assert store.count() == len(catalog)
+
+    seed = agent.index.song_ids[5]  # np.int64, as the index hands it out
+    expected = agent.recommend_by_id(seed, 5)
+    got = agent.recommend_from_store(seed, 5)  # no ANN index yet: exact scan
+    assert got["song_id"].dtype == agent.index.song_ids.dtype
+    assert got["song_id"].tolist() == expected["song_id"].tolist()
+    np.testing.assert_allclose(got["similarity"], expected["similarity"], atol=1e-5)
+
+    store.create_index("hnsw")
+    assert len(store.recommend(int(seed), 5, ef_search=100)) == 5
+
+
+def test_filters_accept_numpy_values_and_decade(agent, catalog):
+    store = agent.store
+    store.load_index(agent.index)
+    seed = agent.index.song_ids[0]
+    for filters in ({"year": (np.int64(1990), np.float64(1999))}, {"decade": np.int64(1990)}, {"decade": [1990]}):
+        expected = agent.recommend_by_id(seed, 10, filters=filters)
+        got = agent.recommend_from_store(seed, 10, filters=filters)
+        assert got["song_id"].tolist() == expected["song_id"].tolist()
+    rows = store.recommend(seed, 10, filters={"genre": np.array(["rock", "jazz"]), "popularity": (np.int64(20), None)})
+    assert rows and all(r[3] in ("rock", "jazz") for r in rows)
@@ -0,0 +1,46 @@
+# tests/test_streaming.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.agents.data_acquisition_agent import DataAcquisitionAgent
+from src.agents.feature_engineering_agent import FeatureEngineeringAgent
+from src.index.feature_index import NUMERICAL_FEATURES, FeatureIndex
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 5000
+    frame = pd.DataFrame({
+        "song_id": np.arange(n) * 7,
+        "title": [f"Song {i}" for i in range(n)],
+        "artist": [f"Artist {i % 50}" for i in range(n)],
+        "genre": rng.choice(["rock", "pop", "jazz"], n),
+        "year": rng.integers(1960, 2020, n),
+    })
+    for name in NUMERICAL_FEATURES:
+        frame[name] = rng.normal(rng.uniform(-5, 5), rng.uniform(0.5, 30), n)
+    frame.loc[rng.random(n) < 0.2, "tempo"] = np.nan
+    path = tmp_path / "tracks.csv"
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def test_streamed_builds_match_build(csv_path):
+    agent, features = DataAcquisitionAgent(csv_path), FeatureEngineeringAgent()
+    agent.load_data()
+    expected = FeatureIndex.build(features.get_features(agent.song_data))
+
+    one_pass = FeatureIndex.from_compact_chunks(features.iter_compact_features(agent.iter_chunks(chunksize=700)))
+    assert one_pass.song_ids.dtype == expected.song_ids.dtype
+    assert one_pass.version == expected.version
+
+    two_pass = FeatureIndex.from_compact_chunks(lambda: features.iter_compact_features(agent.iter_chunks(chunksize=700)))
+    np.testing.assert_array_equal(two_pass.song_ids, expected.song_ids)
+    np.testing.assert_allclose(two_pass.mean, expected.mean, rtol=1e-12)
+    np.testing.assert_allclose(two_pass.scale, expected.scale, rtol=1e-12)
+    np.testing.assert_allclose(two_pass.matrix, expected.matrix, atol=1e-6)
+    assert two_pass.row_of(7) == 1
+    assert two_pass.metadata["year"].dtype.kind == "i"